@@ -0,0 +1,210 @@
+# Read-only JSON API over the same graph indexes the dashboard uses, for scripts and tools.
+# Every route answers with JSON lines (one object per line), paged with ?offset=&limit=
+# (X-Total-Count and a Link rel="next" header describe the rest), and carries an ETag tied
+# to the workbook content so unchanged results come back as 304 Not Modified.
+#
+#   GET /api/specialties
+#   GET /api/nodes?specialty=Radiology&fda=510(k)&years=2015-2020
+#   GET /api/edges?specialty=All
+#   GET /api/devices/<submission>/ancestors      (also /descendants and /component)
+#
+# specialty is a sheet name or All (the default), fda one of the pathway filters, years
+# START-END. Device routes only see devices and edges visible under those filters.
+
+import hashlib
+import re
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+from flask import Response, jsonify, request
+
+import data
+from graph_utils import DETAIL_COLUMNS, FDA_PATHWAYS, LINEAGE_COLUMNS, UNCOUNTED_COLUMNS
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+# Rows serialized per streamed chunk
+CHUNK_ROWS = 1000
+
+NDJSON = 'application/x-ndjson'
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _int_arg(name, default, lo, hi):
+    value = request.args.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"{name} must be an integer")
+    if not lo <= value <= hi:
+        raise ApiError(f"{name} must be between {lo} and {hi}")
+    return value
+
+
+# (specialty, fda_filter, year_range) from the query string
+def _filters(store):
+    specialty = request.args.get('specialty', 'All')
+    if specialty == 'All':
+        specialty = data.ALL_SPECIALTIES
+    if specialty not in store.specialty_versions:
+        raise ApiError(f"unknown specialty {specialty!r}", 404)
+
+    fda_filter = request.args.get('fda', 'all')
+    if fda_filter not in FDA_PATHWAYS:
+        raise ApiError(f"fda must be one of {', '.join(FDA_PATHWAYS)}")
+
+    year_range = None
+    years = request.args.get('years')
+    if years:
+        match = re.fullmatch(r'(\d{4})-(\d{4})', years)
+        if not match:
+            raise ApiError("years must be START-END, e.g. 2000-2025")
+        year_range = [int(match.group(1)), int(match.group(2))]
+    return specialty, fda_filter, year_range
+
+
+# ETag of a response: the content version of the specialty it reads, plus the request itself
+def _etag(version):
+    query = sorted(request.args.items(multi=True))
+    return hashlib.sha1(repr((version, request.path, query)).encode()).hexdigest()
+
+
+# One page of a DataFrame-producing query as streamed JSON lines. rows(start, stop) builds
+# the rows of positions start..stop; it is called a chunk at a time.
+def _paged(total, rows, etag):
+    offset = _int_arg('offset', 0, 0, max(total, 0))
+    limit = _int_arg('limit', DEFAULT_LIMIT, 1, MAX_LIMIT)
+    stop = min(total, offset + limit)
+
+    def stream():
+        for start in range(offset, stop, CHUNK_ROWS):
+            chunk = rows(start, min(stop, start + CHUNK_ROWS))
+            if len(chunk):
+                lines = chunk.to_json(orient='records', lines=True, date_format='iso')
+                yield lines.rstrip('\n') + '\n'
+
+    response = Response(stream(), mimetype=NDJSON)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Total-Count'] = str(total)
+    if stop < total:
+        args = request.args.to_dict()
+        args.update(offset=stop, limit=limit)
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
+
+
+def _node_rows(view, nodes):
+    rows = pd.DataFrame({col: view.column(col)[nodes] for col in DETAIL_COLUMNS})
+    rows['Date'] = pd.to_datetime(view.index.date[view.last_rows[nodes]])
+    return rows
+
+
+# Add the /api routes to a Flask server (app.server)
+def register(server):
+    @server.errorhandler(ApiError)
+    def api_error(error):
+        return jsonify({'error': str(error)}), error.status
+
+    # Answer 304 straight away when the client already has this version
+    def not_modified(etag):
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        return None
+
+    @server.route('/api/specialties')
+    def api_specialties():
+        store = data.get_store()
+        etag = _etag(store.specialty_versions[data.ALL_SPECIALTIES])
+        names = ['All'] + store.sheet_names
+        versions = [store.specialty_versions[data.ALL_SPECIALTIES]] + [
+            store.specialty_versions[name] for name in store.sheet_names]
+        table = pd.DataFrame({'specialty': names, 'version': versions})
+        return not_modified(etag) or _paged(len(table), lambda a, b: table.iloc[a:b], etag)
+
+    @server.route('/api/nodes')
+    def api_nodes():
+        store = data.get_store()
+        specialty, fda_filter, year_range = _filters(store)
+        etag = _etag(store.specialty_versions[specialty])
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        view = store.graph_index(specialty).select(fda_filter, year_range)
+        components = view.components()
+        lineage = view.lineage()
+        node_ids = np.asarray(view.node_ids, dtype=object)
+
+        def rows(start, stop):
+            nodes = np.arange(start, stop)
+            table = _node_rows(view, nodes)
+            table['component'] = components.labels[nodes]
+            table['component_size'] = components.sizes[components.labels[nodes]]
+            for col in LINEAGE_COLUMNS:
+                table[col] = getattr(lineage, col)[nodes]
+            table['root'] = node_ids[lineage.root[nodes]]
+            for col in UNCOUNTED_COLUMNS:
+                table[col] = table[col].where(table[col] >= 0).astype('Int64')
+            return table
+        return _paged(len(view), rows, etag)
+
+    @server.route('/api/edges')
+    def api_edges():
+        store = data.get_store()
+        specialty, fda_filter, year_range = _filters(store)
+        etag = _etag(store.specialty_versions[specialty])
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        view = store.graph_index(specialty).select(fda_filter, year_range)
+        node_ids = np.asarray(view.node_ids, dtype=object)
+
+        def rows(start, stop):
+            return pd.DataFrame({
+                'Predicate': node_ids[view.edge_src[start:stop]],
+                'Submission_Number': node_ids[view.edge_dst[start:stop]],
+            })
+        return _paged(len(view.edge_src), rows, etag)
+
+    @server.route('/api/devices/<submission_number>/<relation>')
+    def api_device(submission_number, relation):
+        if relation not in ('ancestors', 'descendants', 'component'):
+            raise ApiError(f"unknown relation {relation!r}", 404)
+        store = data.get_store()
+        specialty, fda_filter, year_range = _filters(store)
+        etag = _etag(store.specialty_versions[specialty])
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        index = store.graph_index(specialty)
+        view = index.select(fda_filter, year_range)
+        node = view.local_index(submission_number)
+        if node < 0:
+            where = 'in this specialty' if submission_number not in index else 'under these filters'
+            raise ApiError(f"device {submission_number!r} is not visible {where}", 404)
+
+        if relation == 'component':
+            components = view.components()
+            nodes = components.members(components.labels[node])
+            generations = None
+        else:
+            nodes, generations = view.relatives(node, reverse=relation == 'ancestors')
+
+        def rows(start, stop):
+            table = _node_rows(view, nodes[start:stop])
+            if generations is not None:
+                table.insert(1, 'generations', generations[start:stop])
+            return table
+        return _paged(len(nodes), rows, etag)
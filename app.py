@@ -5,16 +5,32 @@ from dash import Dash
 import dash_bootstrap_components as dbc
 from layout import create_layout
 from callbacks import register_callbacks
+from data import start_reloader
+from figure_cache import figure_cache
+import api
+import metrics
 
 app = Dash(__name__, external_stylesheets=[dbc.themes.DARKLY])
 app.title = "FDA AI Devices Predicate Networks"
 
-# Set the app layout using an external layout function
-app.layout = create_layout(app)
+# WSGI entry point for multi-process servers, e.g. gunicorn -w 4 app:server
+server = app.server
+
+# Set the app layout using an external layout function, rebuilt on each page load
+app.layout = lambda: create_layout(app)
 
 # Register all Dash callbacks separately
 register_callbacks(app)
 
+# Latency histograms at /metrics (and opt-in request profiling, see metrics.py)
+metrics.register(app.server, figure_cache=figure_cache.stats)
+
+# Read-only JSON API over the graph indexes at /api
+api.register(app.server)
+
+# Pick up edits to the workbook without a restart
+start_reloader()
+
 # Run the Dash server when the script is executed directly
 if __name__ == "__main__":
     app.run(debug=True)
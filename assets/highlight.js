@@ -0,0 +1,139 @@
+// Client-side search highlighting for the predicate network graph.
+// The server ships every node's and edge's connected-component label with the figure
+// (last customdata column for nodes, per-point customdata for edges), so highlighting
+// a device's network only restyles the figure already in the browser.
+
+(function () {
+    var TYPED_ARRAYS = {
+        i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+        i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array
+    };
+
+    // Plotly ships numpy arrays base64-encoded as {dtype, bdata}
+    function decode(arr) {
+        if (!arr || Array.isArray(arr) || !arr.bdata) {
+            return arr || [];
+        }
+        var bin = atob(arr.bdata);
+        var bytes = new Uint8Array(bin.length);
+        for (var i = 0; i < bin.length; i++) {
+            bytes[i] = bin.charCodeAt(i);
+        }
+        return new TYPED_ARRAYS[arr.dtype](bytes.buffer);
+    }
+
+    function role(trace) {
+        return trace.meta ? trace.meta.role : null;
+    }
+
+    // Specialty value of the merged network (data.ALL_SPECIALTIES)
+    var ALL_SPECIALTIES = '__all__';
+
+    // Device the server highlights on figures of a specialty for this target, like
+    // update_figure: the target, on the merged network or a sheet that lists it
+    function wantedHighlight(target, specialty) {
+        if (!target) {
+            return null;
+        }
+        var listed = specialty === ALL_SPECIALTIES || target.sheets.indexOf(specialty) !== -1;
+        return listed ? target.submission : null;
+    }
+
+    // target is the search-target store: {submission, sheets}, or null to clear; shownKey the
+    // figure-key store, [version, specialty, fda, years, highlight(, window)], or null once
+    // the figure was restyled here. A new target restyles the figure; a new figure from the
+    // server is restyled only when it highlights another device than the target asks for
+    // (it was requested before the search). Returns the restyled figure and clears the
+    // figure-key store, since the figure no longer matches the server's cached copy.
+    // Aggregated figures have no per-device nodes to restyle: their key goes to the
+    // highlight-request store instead, and update_figure rebuilds them highlighted.
+    function highlightNetwork(target, shownKey, figure) {
+        var noUpdate = window.dash_clientside.no_update;
+        if (!figure) {
+            return [noUpdate, noUpdate, noUpdate];
+        }
+        var deviceId = target ? target.submission : null;
+        var triggered = window.dash_clientside.callback_context.triggered.map(function (t) {
+            return t.prop_id;
+        });
+        if (triggered.indexOf('search-target.data') === -1) {
+            if (!shownKey) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+            deviceId = wantedHighlight(target, shownKey[1]);
+            if (deviceId === shownKey[4]) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+        }
+        var data = figure.data.slice();
+
+        var nodeIndex = data.findIndex(function (t) { return role(t) === 'nodes'; });
+        if (nodeIndex === -1) {
+            var aggregated = data.some(function (t) { return role(t) === 'aggregate-nodes'; });
+            var request = aggregated && shownKey ? shownKey : noUpdate;
+            return [noUpdate, noUpdate, request];
+        }
+        var nodes = Object.assign({}, data[nodeIndex]);
+        var customdata = nodes.customdata || [];
+
+        var component = null;
+        var selected = [];
+        if (deviceId) {
+            var match = customdata.find(function (row) { return row[0] === deviceId; });
+            if (match) {
+                component = match[match.length - 1];
+                customdata.forEach(function (row, i) {
+                    if (row[row.length - 1] === component) {
+                        selected.push(i);
+                    }
+                });
+            }
+        }
+
+        if (component === null) {
+            delete nodes.selectedpoints;
+        } else {
+            nodes.selectedpoints = selected;
+        }
+        data[nodeIndex] = nodes;
+
+        // Overlay traces follow the base edge traces in the same color order
+        var overlays = [];
+        data.forEach(function (t, i) {
+            if (role(t) === 'edges-highlight') {
+                overlays.push(i);
+            }
+        });
+
+        var colorIndex = 0;
+        data.forEach(function (t, i) {
+            if (role(t) !== 'edges') {
+                return;
+            }
+            var lineColor = component === null ? t.meta.color : t.meta.dim_color;
+            data[i] = Object.assign({}, t, {line: Object.assign({}, t.line, {color: lineColor})});
+
+            var x = decode(t.x), y = decode(t.y), comp = decode(t.customdata);
+            var hx = [], hy = [], hc = [];
+            if (component !== null) {
+                for (var k = 0; k < comp.length; k += 3) {
+                    if (comp[k] === component) {
+                        hx.push(x[k], x[k + 1], null);
+                        hy.push(y[k], y[k + 1], null);
+                        hc.push(component, component, component);
+                    }
+                }
+            }
+            var overlay = overlays[colorIndex++];
+            data[overlay] = Object.assign({}, data[overlay], {x: hx, y: hy, customdata: hc});
+        });
+
+        return [Object.assign({}, figure, {data: data}), null, noUpdate];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        predicate_network: {
+            highlight_network: highlightNetwork
+        }
+    });
+})();
@@ -0,0 +1,85 @@
+# Heavy figure builds and lineage tables run as Dash background callbacks in separate
+# processes, so a slow rebuild never holds one of the server's request threads. Job results,
+# and the figures and tables the jobs build, are kept in a diskcache directory shared by
+# every server process.
+#
+#   PREDICATE_BACKGROUND=0       build figures and lineage tables inside the request instead
+#   PREDICATE_BACKGROUND_DIR     cache directory (default: background/ in the sheet cache)
+#
+# Needs the diskcache extra (pip install "dash[diskcache]"); without it both are
+# built inside the request as before.
+
+import os
+
+try:
+    import diskcache
+    from dash import DiskcacheManager
+except ImportError:
+    diskcache = None
+
+import data
+from figure_cache import FigureCache, figure_cache, figure_key
+
+CACHE_DIR = os.environ.get('PREDICATE_BACKGROUND_DIR') or os.path.join(
+    data.cache_dir_for(data.WORKBOOK_PATH), 'background')
+CACHE_BYTES = 512 * 1024 * 1024
+
+# Shared figures are dropped an hour after they were built; finished job results, which the
+# browser collects straight away, after ten minutes
+FIGURE_TTL = 3600
+JOB_RESULT_TTL = 600
+
+# Lineage tables kept in memory by each process, on top of the shared copies
+LINEAGE_ENTRIES = 32
+
+# How often the browser polls a running job, in milliseconds
+POLL_INTERVAL = 250
+
+ENABLED = diskcache is not None and os.environ.get('PREDICATE_BACKGROUND', '1') != '0'
+
+if ENABLED:
+    shared_cache = diskcache.Cache(CACHE_DIR, size_limit=CACHE_BYTES)
+    manager = DiskcacheManager(shared_cache, expire=JOB_RESULT_TTL)
+else:
+    shared_cache = manager = None
+
+
+lineage_cache = FigureCache(max_entries=LINEAGE_ENTRIES)
+
+
+def _lookup(cache, kind, key):
+    value = cache.get(key)
+    if value is None and shared_cache is not None:
+        value = shared_cache.get((kind,) + key)
+        if value is not None:
+            cache.put(key, value)
+    return value
+
+
+def _share(cache, kind, key, value):
+    cache.put(key, value)
+    if shared_cache is not None:
+        shared_cache.set((kind,) + key, value, expire=FIGURE_TTL)
+
+
+# Figure cached under key by this process, or by any process sharing the cache directory
+def lookup_figure(key):
+    return _lookup(figure_cache, 'figure', key)
+
+
+def share_figure(key, figure):
+    _share(figure_cache, 'figure', key, figure)
+
+
+# Lineage table (GraphView.lineage_table) of one filtered view, if any process built it
+def lookup_lineage(store, specialty, fda_filter='all', year_range=None):
+    return _lookup(lineage_cache, 'lineage', figure_key(store, specialty, fda_filter, year_range))
+
+
+# Lineage table of one filtered view, built and shared with every process on a miss
+def lineage_table(store, specialty, fda_filter='all', year_range=None):
+    table = lookup_lineage(store, specialty, fda_filter, year_range)
+    if table is None:
+        table = store.graph_index(specialty).lineage_table(fda_filter=fda_filter, year_range=year_range)
+        _share(lineage_cache, 'lineage', figure_key(store, specialty, fda_filter, year_range), table)
+    return table
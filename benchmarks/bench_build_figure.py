@@ -0,0 +1,79 @@
+# Times graph_utils.build_figure on a synthetic sheet and reports trace count and payload size.
+# Pass --compare-rev to run the same measurements against graph_utils.py from another git revision.
+#
+#   python benchmarks/bench_build_figure.py --devices 10000 --compare-rev HEAD~1
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_sheet
+
+
+# Import graph_utils.py as it was at a given git revision
+def load_graph_utils(rev):
+    if rev is None:
+        import graph_utils
+        return graph_utils
+    source = subprocess.run(['git', 'show', f'{rev}:graph_utils.py'], cwd=REPO_ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    module = types.ModuleType(f'graph_utils_{rev}')
+    exec(compile(source, f'{rev}:graph_utils.py', 'exec'), module.__dict__)
+    return module
+
+
+def measure(module, df, repeats, **kwargs):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fig = module.build_figure(df, **kwargs)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    payload = fig.to_json()
+    serialize_time = time.perf_counter() - start
+
+    return {
+        'build_s': statistics.median(timings),
+        'serialize_s': serialize_time,
+        'traces': len(fig.data),
+        'payload_mb': len(payload.encode('utf-8')) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark build_figure on a synthetic sheet")
+    parser.add_argument('--devices', type=int, default=10000)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--compare-rev', default=None,
+                        help='git revision whose graph_utils.py is measured as the "before" case')
+    args = parser.parse_args()
+
+    df = make_sheet(args.devices)
+    highlight = df['Submission_Number'].iloc[len(df) // 2]
+    cases = [('all', {}), ('highlight', {'highlight_node': highlight})]
+
+    variants = [('current', None)]
+    if args.compare_rev:
+        variants.insert(0, (args.compare_rev, args.compare_rev))
+
+    print(f"{len(df)} rows")
+    print(f"{'variant':<12} {'case':<10} {'build_s':>9} {'serialize_s':>12} {'traces':>7} {'payload_mb':>11}")
+    for label, rev in variants:
+        module = load_graph_utils(rev)
+        for case, kwargs in cases:
+            r = measure(module, df, args.repeats, **kwargs)
+            print(f"{label:<12} {case:<10} {r['build_s']:>9.3f} {r['serialize_s']:>12.3f} "
+                  f"{r['traces']:>7} {r['payload_mb']:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
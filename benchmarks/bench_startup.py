@@ -0,0 +1,59 @@
+# Measures how long a fresh process takes to get data.py ready for the page layout (import
+# plus the workbook's sheet names and year range) and for the first graph (every sheet loaded
+# into the merged graph index), with and without the sheet cache.
+#
+#   python benchmarks/bench_startup.py --devices 20000
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import specialty_sizes, write_workbook
+
+LAYOUT = 'import data; data.get_store().min_year'
+FIRST_GRAPH = 'import data; data.graph_indexes[data.get_store().sheet_names[0]]'
+
+
+def time_script(workdir, script):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', script], cwd=workdir, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data.py startup with and without the sheet cache")
+    parser.add_argument('--devices', type=int, default=20000, help='devices across all sheets')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    sheet_sizes = specialty_sizes(args.devices)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workbook = os.path.join(workdir, 'predicate_data_main.xlsx')
+        write_workbook(workbook, sheet_sizes)
+        cache = os.path.join(workdir, 'predicate_data_main.cache')
+
+        print(f"{sum(sheet_sizes.values())} devices in {len(sheet_sizes)} sheets, "
+              f"workbook {os.path.getsize(workbook) / 1e6:.1f} MB")
+        for label, script in [('layout', LAYOUT), ('first graph', FIRST_GRAPH)]:
+            uncached = []
+            for _ in range(args.repeats):
+                shutil.rmtree(cache, ignore_errors=True)
+                uncached.append(time_script(workdir, script))
+            cached = [time_script(workdir, script) for _ in range(args.repeats)]
+            print(f"{label:<12} uncached {statistics.median(uncached):6.2f} s   "
+                  f"cached {statistics.median(cached):6.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+# Benchmark suite over synthetic workbooks of several sizes: data loading, build_figure under
+# different filters, highlights and zooms, network (BFS) lookups, search, and figure payload size.
+# Results are written as JSON so runs can be compared with --compare.
+#
+#   python benchmarks/bench_suite.py --sizes 1000 10000 100000
+#   python benchmarks/bench_suite.py --sizes 10000 --compare benchmarks/results/<earlier run>.json
+#
+# Each size runs in a fresh process started in a temporary directory holding its workbook.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import specialty_sizes, write_workbook
+
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+# Slower than the baseline by more than this ratio is flagged by --compare
+REGRESSION_RATIO = 1.2
+
+NETWORK_LOOKUPS = 200
+SEARCH_QUERIES = ['k1', 'synthetic device', 'company 17', 'compnay 17', 'synthetc']
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _median_time(func, repeats):
+    return statistics.median(_timed(func)[0] for _ in range(repeats))
+
+
+# Measurements for the workbook in the current directory; runs in the child process
+def measure_workbook(repeats):
+    import numpy as np
+    import data
+    from graph_utils import build_figure
+
+    results = {}
+    workbook = data.WORKBOOK_PATH
+
+    # Loading: a cold parse of every sheet (rebuilding the cache), then a load from the cache
+    def load_all():
+        store = data.DataStore(workbook)
+        for name in store.sheet_names:
+            store.sheet(name)
+        return store
+
+    shutil.rmtree(data.cache_dir_for(workbook), ignore_errors=True)
+    results['load.parse_s'], store = _timed(load_all)
+    results['load.cached_s'] = _median_time(load_all, repeats)
+    results['index.merged_s'], merged = _timed(store.merged_index)
+    results['index.search_s'], search = _timed(store.search_index)
+    results['devices'] = len(merged.node_ids)
+    results['edges'] = len(merged.select().edge_src)
+
+    largest = max(store.sheet_names, key=lambda name: len(store.sheet(name)))
+    for label, specialty in [('all', data.ALL_SPECIALTIES), ('largest', largest)]:
+        index = store.graph_index(specialty)
+        view = index.select()
+
+        # Highlight a device in the biggest network, where highlighting costs the most
+        components = view.components()
+        biggest = int(np.argmax(components.sizes))
+        highlight = view.node_ids[components.members(biggest)[0]]
+        n_families = int(np.nanmax(view.positions()[0]))
+        cases = {
+            'unfiltered': {},
+            '510k': {'fda_filter': '510(k)'},
+            'de_novo': {'fda_filter': 'De Novo'},
+            'last_10_years': {'year_range': [store.max_year - 9, store.max_year]},
+            'highlight': {'highlight_node': highlight},
+            'zoom_10pct': {'x_range': [0, max(1, n_families // 10)]},
+            'full_detail': {'lod': False},
+        }
+        for case, kwargs in cases.items():
+            def build():
+                index._views.clear()
+                return build_figure(index, **kwargs)
+            prefix = f'figure.{label}.{case}'
+            results[f'{prefix}.build_s'] = _median_time(build, repeats)
+            fig = build()
+            results[f'{prefix}.serialize_s'], payload = _timed(fig.to_json)
+            results[f'{prefix}.payload_bytes'] = len(payload.encode('utf-8'))
+            results[f'{prefix}.traces'] = len(fig.data)
+
+        # Network lookups: the first one labels every component, later ones reuse the labels
+        index._views.clear()
+        view = index.select()
+        rng = np.random.default_rng(0)
+        sample = view.node_ids[rng.choice(len(view), size=min(NETWORK_LOOKUPS, len(view)), replace=False)]
+        results[f'network.{label}.first_s'], _ = _timed(lambda: view.network(sample[0]))
+        seconds, _ = _timed(lambda: [view.network(node) for node in sample])
+        results[f'network.{label}.lookup_s'] = seconds / len(sample)
+
+    results['search.query_s'] = statistics.median(
+        _median_time(lambda: search.search(query), repeats) for query in SEARCH_QUERIES)
+    return results
+
+
+def _git_revision():
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, check=True,
+                             capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return rev + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(n_devices, repeats):
+    with tempfile.TemporaryDirectory() as workdir:
+        workbook = os.path.join(workdir, 'predicate_data_main.xlsx')
+        write_workbook(workbook, specialty_sizes(n_devices))
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT, PREDICATE_RELOAD_INTERVAL='0')
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', '--repeats', str(repeats)],
+                               cwd=workdir, env=env, check=True, capture_output=True, text=True)
+        results = json.loads(child.stdout.splitlines()[-1])
+        results['workbook_bytes'] = os.path.getsize(workbook)
+        return results
+
+
+# Print every shared timing metric of two runs with its ratio, flagging regressions
+def compare(baseline, current):
+    print(f"\n{'size':>7} {'metric':<44} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for size, metrics in current['results'].items():
+        before = baseline['results'].get(size, {})
+        for name, value in metrics.items():
+            if name not in before or not name.endswith(('_s', '_bytes')) or not before[name]:
+                continue
+            ratio = value / before[name]
+            flag = '  <-- slower' if ratio > REGRESSION_RATIO and name.endswith('_s') else ''
+            print(f"{size:>7} {name:<44} {before[name]:>10.4g} {value:>10.4g} {ratio:>7.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite over synthetic workbooks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help='devices per workbook, e.g. 1000 10000 100000')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--out', help='results file (default: benchmarks/results/<time>_<rev>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_workbook(args.repeats)))
+        return
+
+    rev = _git_revision()
+    run = {
+        'revision': rev,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeats': args.repeats,
+        'results': {},
+    }
+    for n_devices in args.sizes:
+        print(f"{n_devices} devices...", flush=True)
+        results = run_size(n_devices, args.repeats)
+        run['results'][str(n_devices)] = results
+        for name in ['load.parse_s', 'load.cached_s', 'index.merged_s',
+                     'figure.all.unfiltered.build_s', 'figure.all.unfiltered.payload_bytes',
+                     'network.all.lookup_s', 'search.query_s']:
+            print(f"  {name:<40} {results[name]:.4g}")
+
+    out = args.out
+    if out is None:
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        out = os.path.join(RESULTS_DIR, f'{stamp}_{rev or "unknown"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(run, f, indent=1)
+    print(f"Results written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), run)
+
+
+if __name__ == '__main__':
+    main()
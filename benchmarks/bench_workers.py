@@ -0,0 +1,111 @@
+# Measures what each server worker costs with and without the shared store (shared_store.py):
+# N worker processes start side by side, each importing the app and building the first page,
+# then the memory of every worker is read from /proc while they are all alive.
+#
+#   python benchmarks/bench_workers.py --devices 100000 --workers 4
+#
+# RSS counts every page a worker touches, including the store's memory-mapped pages that
+# all workers share; PSS divides shared pages between the processes sharing them, so it is
+# the fairer per-worker cost. USS is memory private to the worker. Linux only.
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import specialty_sizes, write_workbook
+
+# A worker: import the app and build the first page, report how long that took, then stay
+# alive until the parent has read its memory
+WORKER = '''
+import sys, time
+start = time.perf_counter()
+from app import app
+app.layout()
+print(time.perf_counter() - start, flush=True)
+sys.stdin.read()
+'''
+
+
+# Rss, Pss and USS of a process in MB, from /proc/<pid>/smaps_rollup
+def memory_mb(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {'rss_mb': fields['Rss'], 'pss_mb': fields['Pss'],
+            'uss_mb': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def run_workers(workdir, n_workers, shared):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, PREDICATE_RELOAD_INTERVAL='0',
+               PREDICATE_SHARED_STORE='1' if shared else '0')
+    workers = [subprocess.Popen([sys.executable, '-c', WORKER], cwd=workdir, env=env,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+               for _ in range(n_workers)]
+    try:
+        startup = [float(worker.stdout.readline()) for worker in workers]
+        memory = [memory_mb(worker.pid) for worker in workers]
+    finally:
+        for worker in workers:
+            worker.stdin.close()
+            worker.wait()
+    return {
+        'startup_s': statistics.median(startup),
+        'startup_max_s': max(startup),
+        **{name: statistics.median(m[name] for m in memory) for name in memory[0]},
+        'total_pss_mb': sum(m['pss_mb'] for m in memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory and startup time with and without the shared store")
+    parser.add_argument('--devices', type=int, default=20000, help='devices across all sheets')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--out', help='also write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {'devices': args.devices, 'workers': args.workers, 'modes': {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        workbook = os.path.join(workdir, 'predicate_data_main.xlsx')
+        write_workbook(workbook, specialty_sizes(args.devices))
+        cache = os.path.join(workdir, 'predicate_data_main.cache')
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT, PREDICATE_RELOAD_INTERVAL='0')
+
+        # Both modes start from a warm sheet cache, as after the first deploy; shared mode
+        # also runs the preload step first
+        subprocess.run([sys.executable, '-c', 'import data; data.get_store().merged_index()'],
+                       cwd=workdir, env=env, check=True)
+        results['modes']['default'] = run_workers(workdir, args.workers, shared=False)
+
+        subprocess.run([sys.executable, os.path.join(REPO_ROOT, 'shared_store.py')], cwd=workdir, check=True, stdout=subprocess.DEVNULL,
+                       env=dict(env, PREDICATE_SHARED_STORE='1'))
+        results['modes']['shared'] = run_workers(workdir, args.workers, shared=True)
+        results['store_mb'] = sum(
+            os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(cache)
+            for name in names if os.path.basename(root).startswith('shared_')) / 1e6
+        shutil.rmtree(cache, ignore_errors=True)
+
+    print(f"{args.devices} devices, {args.workers} workers, shared store {results['store_mb']:.1f} MB")
+    print(f"{'mode':<8} {'startup s':>10} {'max s':>7} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8} {'total PSS MB':>13}")
+    for mode, m in results['modes'].items():
+        print(f"{mode:<8} {m['startup_s']:>10.2f} {m['startup_max_s']:>7.2f} {m['rss_mb']:>8.1f} "
+              f"{m['pss_mb']:>8.1f} {m['uss_mb']:>8.1f} {m['total_pss_mb']:>13.1f}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# Generates synthetic predicate-network sheets shaped like predicate_data_main.xlsx
+# so benchmarks can run without the real (unshared) workbook
+
+import numpy as np
+import pandas as pd
+
+SPECIALTIES = ['Radiology', 'Cardiology', 'Neurology', 'Hematology', 'Gastroenterology']
+SPECIALTY_WEIGHTS = [0.6, 0.15, 0.1, 0.1, 0.05]
+
+FDA_PATHWAYS = ['510(k)', 'De Novo', 'Premarket']
+FDA_WEIGHTS = [0.93, 0.05, 0.02]
+SUBMISSION_PREFIX = {'510(k)': 'K', 'De Novo': 'DEN', 'Premarket': 'P'}
+
+
+# Build one synthetic specialty sheet with n_devices rows (already cleaned like data.py does)
+def make_sheet(n_devices, seed=0, specialty='Radiology', family_size=12, duplicate_rate=0.01):
+    rng = np.random.default_rng(seed)
+
+    fda = rng.choice(FDA_PATHWAYS, size=n_devices, p=FDA_WEIGHTS)
+    serial = rng.permutation(n_devices) + 100000 + seed * 1000000
+    submission = np.array([f"{SUBMISSION_PREFIX[p]}{s}" for p, s in zip(fda, serial)], dtype=object)
+
+    # Devices are grouped into families; inside a family each device predicates on an earlier one
+    n_families = max(1, n_devices // family_size)
+    family = np.sort(rng.integers(1, n_families + 1, size=n_devices))
+    days = rng.integers(0, 30 * 365, size=n_devices)
+    dates = pd.Timestamp('1995-01-01') + pd.to_timedelta(days, unit='D')
+
+    order = np.lexsort((days, family))
+    submission, family, fda, dates = submission[order], family[order], fda[order], dates[order]
+
+    predicate = np.empty(n_devices, dtype=object)
+    predloc = np.empty(n_devices, dtype=object)
+    first_in_family = np.r_[True, family[1:] != family[:-1]]
+    family_start = np.maximum.accumulate(np.where(first_in_family, np.arange(n_devices), 0))
+    for i in range(n_devices):
+        if first_in_family[i]:
+            roll = rng.random()
+            if fda[i] != '510(k)' or roll < 0.3:
+                predicate[i], predloc[i] = 'N/A', 'No predicate'
+            elif roll < 0.7:
+                predicate[i], predloc[i] = f"K{rng.integers(800000, 999999)}", 'Non AI device'
+            else:
+                predicate[i], predloc[i] = f"K{rng.integers(100000, 199999)}", 'Other AI device'
+        else:
+            predicate[i] = submission[rng.integers(family_start[i], i)]
+            predloc[i] = 'Specialty AI device'
+
+    df = pd.DataFrame({
+        'Submission_Number': submission,
+        'Device': [f"{f}.{i}" for i, f in enumerate(family)],
+        'Date': dates,
+        'FDA': fda,
+        'FDA_Pathway': fda,
+        'Creep': rng.choice(['Yes', 'No', ''], size=n_devices, p=[0.1, 0.6, 0.3]),
+        'Predicate_Location': predloc,
+        'Device_Name': [f"Synthetic Device {s}" for s in submission],
+        'Device_Summary': [f"https://www.accessdata.fda.gov/cdrh_docs/pdf/{s}.pdf" for s in submission],
+        'Short_Description': 'Software that analyses medical images to assist clinicians.',
+        'Secondary_Specialty': specialty,
+        'Classification': rng.choice(['LLZ', 'QIH', 'QAS', 'MYN', 'QFM'], size=n_devices),
+        'Predicate': predicate,
+        'Company': rng.choice([f"Company {c}" for c in range(200)], size=n_devices),
+        'Lead_Specialty': specialty,
+    })
+
+    # A few submissions appear twice, as they do in the real workbook
+    n_dup = int(n_devices * duplicate_rate)
+    if n_dup:
+        dup_rows = df.iloc[rng.choice(n_devices, size=n_dup, replace=False)].copy()
+        dup_rows['Creep'] = 'Yes'
+        df = pd.concat([df, dup_rows], ignore_index=True)
+
+    df['family'] = df['Device'].str.extract(r'^(\d+)', expand=False).astype(int)
+    return df
+
+
+# Split n_devices over the specialty sheets, Radiology-heavy like the real workbook
+def specialty_sizes(n_devices):
+    return {name: max(1, int(n_devices * w)) for name, w in zip(SPECIALTIES, SPECIALTY_WEIGHTS)}
+
+
+# Write a multi-sheet workbook like predicate_data_main.xlsx; sheet_sizes maps specialty -> devices.
+# Like the real workbook, a shared_rate fraction of each later sheet's rows are devices copied
+# from the first sheet, so the merged "All specialties" network links sheets together.
+def write_workbook(path, sheet_sizes, seed=0, shared_rate=0.05):
+    first = None
+    with pd.ExcelWriter(path) as writer:
+        for i, (specialty, n_devices) in enumerate(sheet_sizes.items()):
+            df = make_sheet(n_devices, seed=seed + i, specialty=specialty)
+            if first is None:
+                first = df
+            elif shared_rate:
+                rng = np.random.default_rng(seed + i)
+                n_shared = min(len(first), int(n_devices * shared_rate))
+                shared = first.iloc[rng.choice(len(first), size=n_shared, replace=False)].copy()
+                shared['Secondary_Specialty'] = specialty
+                df = pd.concat([df, shared], ignore_index=True)
+            df.drop(columns='family').to_excel(writer, sheet_name=specialty, index=False)
@@ -1,72 +1,378 @@
 # Contains Dash callback functions for interactivity
 
-from dash import Input, Output, State, callback_context, no_update, html
-from data import all_sheets
-from graph_utils import build_figure
+import pandas as pd
+from dash import ClientsideFunction, Input, Output, State, callback_context, no_update, html
+import background
+import data
+from figure_cache import figure_cache, figure_key, figure_patch, key_from_json
+from graph_utils import AGGREGATE_NODE_ROLE, LOD_NODE_THRESHOLD, UNCOUNTED_COLUMNS, build_figure
+from metrics import timed, timer
+
+SUGGESTION_LIMIT = 8
+
+
+# Plotted window from a relayoutData event as (x_range, y_range), where None means the
+# axis shows its full extent, or None if the event did not change either axis
+def relayout_window(relayout):
+    if not relayout or not any(key.startswith(('xaxis.', 'yaxis.')) for key in relayout):
+        return None
+    window = []
+    for axis in ('xaxis', 'yaxis'):
+        if f'{axis}.range[0]' in relayout:
+            window.append((relayout[f'{axis}.range[0]'], relayout[f'{axis}.range[1]']))
+        elif f'{axis}.range' in relayout:
+            window.append(tuple(relayout[f'{axis}.range']))
+        else:
+            window.append(None)
+    return tuple(window)
+
+
+# Whether a figure dict draws devices aggregated by family and time period
+def is_aggregated(figure):
+    return any(trace.get('meta', {}).get('role') == AGGREGATE_NODE_ROLE for trace in figure['data'])
+
+
+# Records of one page of a lineage table (GraphView.lineage_table) under the table's sort,
+# and the number of pages
+def lineage_page(table, page_current, page_size, sort_by):
+    if sort_by:
+        table = table.sort_values(sort_by[0]['column_id'],
+                                  ascending=sort_by[0]['direction'] == 'asc', kind='stable')
+    page = table.iloc[page_current * page_size:(page_current + 1) * page_size].astype(object)
+    page['non_ai_ancestor'] = page['non_ai_ancestor'].map({True: 'Yes', False: 'No'})
+    page = page.where(page.notna(), None)
+    return page.to_dict('records'), max(1, -(-len(table) // page_size))
+
+
+# Lineage metrics of one device from its view's lineage table, like GraphView.lineage_of,
+# or None when the table doesn't list it
+def lineage_row(table, submission_number):
+    rows = table.index[table['Submission_Number'] == submission_number]
+    if not len(rows):
+        return None
+    row = table.loc[rows[0]]
+    metrics = {col: row[col] for col in ('depth', 'root_distance', 'root')}
+    for col in UNCOUNTED_COLUMNS:
+        metrics[col] = None if pd.isna(row[col]) else int(row[col])
+    metrics['non_ai_ancestor'] = bool(row['non_ai_ancestor'])
+    metrics['creep_distance'] = -1 if pd.isna(row['creep_distance']) else int(row['creep_distance'])
+    return metrics
+
+
+# What to send the browser for a new figure: a Patch of just the properties that differ from
+# the figure it shows (shown_key, from the figure-key store) when that one is still cached,
+# otherwise the whole figure
+def figure_update(shown_key, figure):
+    shown = background.lookup_figure(key_from_json(shown_key)) if shown_key else None
+    patch = figure_patch(shown, figure) if shown is not None else None
+    return figure if patch is None else patch
+
+
+# Build the figure update_figure asked for: a zoomed window of a large view, or a whole
+# filtered view, which is then cached for every server process. Returns the figure dict and
+# its key. A window's key is its view's key plus the window; windows aren't cached, so
+# nothing is ever patched against one, but the key still says which device it highlights.
+# Returns (None, None) for a window of a view small enough to be drawn in full anyway.
+def build_requested_figure(job):
+    store = data.get_store()
+    key = figure_key(store, job['specialty'], job['fda_filter'], job['year_range'], job['highlight_node'])
+    if job['window'] is not None:
+        index = store.graph_index(job['specialty'])
+        if len(index.select(job['fda_filter'], job['year_range'])) <= LOD_NODE_THRESHOLD:
+            return None, None
+        x_range, y_range = job['window']
+        figure = build_figure(index, fda_filter=job['fda_filter'],
+                              year_range=job['year_range'], highlight_node=job['highlight_node'],
+                              x_range=x_range, y_range=y_range)
+        return figure.to_plotly_json(), key + (job['window'],)
+
+    figure = background.lookup_figure(key)
+    if figure is None:
+        figure = build_figure(store.graph_index(job['specialty']), fda_filter=job['fda_filter'],
+                              year_range=job['year_range'], highlight_node=job['highlight_node'])
+        with timed('figure_cache.to_plotly_json'):
+            figure = figure.to_plotly_json()
+        background.share_figure(key, figure)
+    return figure, key
+
 
 # Register all Dash app callbacks
 def register_callbacks(app):
 
+    # After a workbook reload, drop figures and lineage tables of sheets whose content changed
+    @data.on_reload
+    def drop_stale_figures(store):
+        live_versions = set(store.specialty_versions.values())
+        figure_cache.discard(lambda key: key[0] not in live_versions)
+        background.lineage_cache.discard(lambda key: key[0] not in live_versions)
+
+    # Cheap updates (cached figures, unchanged views) are answered in the request; anything
+    # that needs building is handed to run_figure_job through the figure-job store.
+    # Cached figures go out as patches against the figure already shown.
     @app.callback(
         Output('predicate-network-graph', 'figure'),
+        Output('figure-job', 'data'),
+        Output('figure-key', 'data'),
         [
             Input('specialty-dropdown', 'value'),
             Input('fda_filter', 'value'),
             Input('year_slider', 'value'),
+            Input('predicate-network-graph', 'relayoutData'),
+            Input('highlight-request', 'data')
+        ],
+        [State('search-target', 'data'), State('figure-key', 'data')]
+    )
+    @timer('callback.update_figure')
+    def update_figure(specialty, fda_value, year_range, relayout, request, target, shown_key):
+        store = data.get_store()
+        ctx = callback_context
+        if not ctx.triggered or specialty not in store.specialty_versions:
+            return no_update, no_update, no_update
+
+        # The searched device stays highlighted on every figure of a sheet that lists it
+        highlight = None
+        if target and (specialty == data.ALL_SPECIALTIES or specialty in target['sheets']):
+            highlight = target['submission']
+        job = {'specialty': specialty, 'fda_filter': fda_value, 'year_range': year_range,
+               'highlight_node': highlight, 'window': None}
+
+        # Zooming only matters for figures aggregated at full extent: the zoomed window is
+        # redrawn in full detail, or with finer bins while it is still too dense. Whether the
+        # view is aggregated is read off its cached figure; without one the job decides.
+        key = figure_key(store, specialty, fda_value, year_range, highlight)
+        full_figure = background.lookup_figure(key)
+        triggered = {t['prop_id'] for t in ctx.triggered}
+        if triggered == {'predicate-network-graph.relayoutData'}:
+            window = relayout_window(relayout)
+            if window is None or (full_figure is not None and not is_aggregated(full_figure)):
+                return no_update, no_update, no_update
+            if window != (None, None):
+                job['window'] = window
+        # Aggregated figures can't be restyled in the browser, so assets/highlight.js asks for
+        # the figure it shows (the key of its view and window) again with the current target
+        elif triggered == {'highlight-request.data'}:
+            request = key_from_json(request)
+            if request is None or request[:4] != key[:4] or request[4] == highlight:
+                return no_update, no_update, no_update
+            if len(request) > 5:
+                job['window'] = request[5]
+        if job['window'] is None and full_figure is not None:
+            return figure_update(shown_key, full_figure), no_update, key
+
+        if not background.ENABLED:
+            figure, key = build_requested_figure(job)
+            if figure is None:
+                return no_update, no_update, no_update
+            return figure_update(shown_key, figure), no_update, key
+        return no_update, job, no_update
+
+    if background.ENABLED:
+        # Builds run in a background process; the browser polls for the result. A newer job,
+        # or any change to the figure's inputs meanwhile, terminates one still running.
+        @app.callback(
+            Output('predicate-network-graph', 'figure', allow_duplicate=True),
+            Output('figure-key', 'data', allow_duplicate=True),
+            Input('figure-job', 'data'),
+            State('figure-key', 'data'),
+            background=True,
+            manager=background.manager,
+            interval=background.POLL_INTERVAL,
+            running=[(Output('predicate-network-graph', 'className'), 'figure-building', '')],
+            cancel=[
+                Input('specialty-dropdown', 'value'),
+                Input('fda_filter', 'value'),
+                Input('year_slider', 'value'),
+                Input('predicate-network-graph', 'relayoutData'),
+                Input('highlight-request', 'data')
+            ],
+            prevent_initial_call=True
+        )
+        def run_figure_job(job, shown_key):
+            if not job:
+                return no_update, no_update
+            figure, key = build_requested_figure(job)
+            if figure is None:
+                return no_update, no_update
+            return figure_update(shown_key, figure), key
+
+    # Autocomplete suggestions for the search box from the index over every sheet
+    @app.callback(
+        Output('device-suggestions', 'children'),
+        Input('device-search', 'value')
+    )
+    @timer('callback.suggest_devices')
+    def suggest_devices(query):
+        if not query or len(query.strip()) < 2:
+            return []
+        hits = data.get_store().search_index().search(query, limit=SUGGESTION_LIMIT)
+        return [html.Option(value=hit['Submission_Number'],
+                            label=f"{hit['Device_Name']} · {hit['Company']} ({', '.join(hit['sheets'])})")
+                for hit in hits]
+
+    # Resolve a search to one device, switching to a sheet that lists it if the current one
+    # doesn't. "Clear Highlight" drops the target.
+    @app.callback(
+        Output('search-target', 'data'),
+        Output('specialty-dropdown', 'value'),
+        Output('device-search', 'value'),
+        [
             Input('search-button', 'n_clicks'),
             Input('device-search', 'n_submit'),
             Input('clear-button', 'n_clicks')
         ],
-        State('device-search', 'value')
+        [State('device-search', 'value'), State('specialty-dropdown', 'value')],
+        prevent_initial_call=True
+    )
+    @timer('callback.resolve_search')
+    def resolve_search(search_clicks, enter_presses, clear_clicks, query, specialty):
+        triggered = {t['prop_id'].split('.')[0] for t in callback_context.triggered}
+        if 'clear-button' in triggered or not query:
+            return None, no_update, no_update
+
+        hits = data.get_store().search_index().search(query, limit=1)
+        if not hits:
+            return None, no_update, no_update
+
+        hit = hits[0]
+        target = {'submission': hit['Submission_Number'], 'sheets': hit['sheets']}
+        jump = no_update
+        if specialty != data.ALL_SPECIALTIES and specialty not in hit['sheets']:
+            jump = hit['sheets'][0]
+        canonical = hit['Submission_Number'] if hit['Submission_Number'] != query else no_update
+        return target, jump, canonical
+
+    # A new search target restyles the current figure in the browser (assets/highlight.js);
+    # when the search switched sheets, update_figure highlights the new figure instead.
+    # The restyled figure no longer matches a cached one, so the next update is sent whole.
+    # A figure arriving with a different highlight than the current target (a build that
+    # started before the search) is restyled the same way when its figure-key lands.
+    # Aggregated figures are requested from update_figure through highlight-request instead.
+    app.clientside_callback(
+        ClientsideFunction(namespace='predicate_network', function_name='highlight_network'),
+        Output('predicate-network-graph', 'figure', allow_duplicate=True),
+        Output('figure-key', 'data', allow_duplicate=True),
+        Output('highlight-request', 'data'),
+        Input('search-target', 'data'),
+        Input('figure-key', 'data'),
+        State('predicate-network-graph', 'figure'),
+        prevent_initial_call=True
     )
-    def update_figure(specialty, fda_value, year_range,
-                      search_clicks, enter_presses, clear_clicks,
-                      device_id):
-        df = all_sheets[specialty]
-        ctx = callback_context
-        if not ctx.triggered:
-            return no_update
 
-        triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
+    # One page of the lineage table, sorted over the whole filtered graph. Tables another
+    # request already built are paged in the request; building one is handed to
+    # run_lineage_job through the lineage-job store.
+    @app.callback(
+        Output('lineage-table', 'data'),
+        Output('lineage-table', 'page_count'),
+        Output('lineage-table', 'page_current'),
+        Output('lineage-job', 'data'),
+        [
+            Input('specialty-dropdown', 'value'),
+            Input('fda_filter', 'value'),
+            Input('year_slider', 'value'),
+            Input('lineage-table', 'page_current'),
+            Input('lineage-table', 'page_size'),
+            Input('lineage-table', 'sort_by')
+        ]
+    )
+    @timer('callback.update_lineage_table')
+    def update_lineage_table(specialty, fda_value, year_range, page_current, page_size, sort_by):
+        store = data.get_store()
+        if specialty not in store.specialty_versions:
+            return no_update, no_update, no_update, no_update
 
-        if triggered_id == 'clear-button':
-            return build_figure(df, fda_filter=fda_value, year_range=year_range, highlight_node=None)
+        # A new graph starts back on the first page
+        triggered = {t['prop_id'].split('.')[0] for t in callback_context.triggered}
+        if 'lineage-table' not in triggered:
+            page_current = 0
 
-        elif triggered_id in ('search-button', 'device-search'):
-            if device_id and device_id in df['Submission_Number'].values:
-                return build_figure(df, fda_filter=fda_value, year_range=year_range, highlight_node=device_id)
-            else:
-                return build_figure(df, fda_filter=fda_value, year_range=year_range, highlight_node=None)
+        table = background.lookup_lineage(store, specialty, fda_value, year_range)
+        if table is None:
+            if background.ENABLED:
+                job = {'specialty': specialty, 'fda_filter': fda_value, 'year_range': year_range,
+                       'page_current': page_current, 'page_size': page_size, 'sort_by': sort_by}
+                return no_update, no_update, page_current, job
+            table = background.lineage_table(store, specialty, fda_value, year_range)
+        return (*lineage_page(table, page_current, page_size, sort_by), page_current, no_update)
 
-        return build_figure(df, fda_filter=fda_value, year_range=year_range, highlight_node=None)
+    if background.ENABLED:
+        # Lineage tables are built in a background process like figures; a change to the
+        # filters meanwhile terminates a build still running
+        @app.callback(
+            Output('lineage-table', 'data', allow_duplicate=True),
+            Output('lineage-table', 'page_count', allow_duplicate=True),
+            Input('lineage-job', 'data'),
+            background=True,
+            manager=background.manager,
+            interval=background.POLL_INTERVAL,
+            running=[(Output('lineage-panel', 'className'), 'lineage-building', '')],
+            cancel=[
+                Input('specialty-dropdown', 'value'),
+                Input('fda_filter', 'value'),
+                Input('year_slider', 'value')
+            ],
+            prevent_initial_call=True
+        )
+        def run_lineage_job(job):
+            if not job:
+                return no_update, no_update
+            store = data.get_store()
+            if job['specialty'] not in store.specialty_versions:
+                return no_update, no_update
+            table = background.lineage_table(store, job['specialty'], job['fda_filter'], job['year_range'])
+            return lineage_page(table, job['page_current'], job['page_size'], job['sort_by'])
 
     @app.callback(
         Output('info-offcanvas', 'is_open'),
         Output('info-content', 'children'),
         Input('predicate-network-graph', 'clickData'),
-        [State('info-offcanvas', 'is_open'), State('specialty-dropdown', 'value')]
+        [State('info-offcanvas', 'is_open'), State('specialty-dropdown', 'value'),
+         State('fda_filter', 'value'), State('year_slider', 'value')]
     )
-    def show_device_info_on_click(clickData, is_open, specialty):
+    @timer('callback.show_device_info_on_click')
+    def show_device_info_on_click(clickData, is_open, specialty, fda_value, year_range):
         if not clickData:
             return False, no_update
 
         points = clickData['points']
         if not points:
             return False, no_update
+        # Aggregated markers stand for many devices and carry no submission number
+        if 'customdata' not in points[0]:
+            return no_update, no_update
+
+        # The figure only carries the submission number; look the rest up server-side
+        store = data.get_store()
+        if specialty not in store.specialty_versions:
+            return False, no_update
+        index = store.graph_index(specialty)
+        details = index.node_details(
+            points[0]['customdata'][0], fda_filter=fda_value, year_range=year_range)
+        if details is None:
+            return False, no_update
+        # Lineage metrics come from the view's lineage table once one is built; without
+        # background jobs they are computed here, otherwise left out until the table is ready
+        table = background.lookup_lineage(store, specialty, fda_value, year_range)
+        if table is not None:
+            lineage = lineage_row(table, details['Submission_Number'])
+        elif not background.ENABLED:
+            lineage = index.lineage(details['Submission_Number'], fda_filter=fda_value,
+                                    year_range=year_range)
+        else:
+            lineage = None
 
-        cdata = points[0]['customdata']
-        device_id = cdata[0]
-        device_name = cdata[1]
-        device_summary = cdata[2]
-        classification = cdata[3]
-        node_pred = cdata[4]
-        date_val = cdata[5]
-        fda_val = cdata[6]
-        creep_val = cdata[7]
-        company_val = cdata[8]
-        leadspec_val = cdata[9]
-        sec_spec_val = cdata[10]
-        short_desc_val = cdata[11]
+        device_id = details['Submission_Number']
+        device_name = details['Device_Name']
+        device_summary = details['Device_Summary']
+        classification = details['Classification']
+        node_pred = details['Predicate']
+        date_val = details['Date']
+        fda_val = details['FDA']
+        creep_val = details['Creep']
+        company_val = details['Company']
+        leadspec_val = details['Lead_Specialty']
+        sec_spec_val = details['Secondary_Specialty']
+        short_desc_val = details['Short_Description']
 
         summary_link = html.A("Link to Summary", href=device_summary, target="_blank") \
             if device_summary else "No summary link."
@@ -83,7 +389,20 @@ def register_callbacks(app):
             html.P(f"FDA Pathway: {fda_val}"),
             html.P(f"Predicate: {node_pred if node_pred else 'None'}"),
             html.P(f"Potential Predicate Creep Risk: {creep_val}"),
-            summary_link
         ]
+        if lineage:
+            creep_distance = lineage['creep_distance']
+            ancestors, descendants = (
+                'n/a' if lineage[col] is None else lineage[col] for col in UNCOUNTED_COLUMNS)
+            content += [
+                html.P(f"Predicate Chain Depth: {lineage['depth']}"),
+                html.P(f"Distance to Root Device: {lineage['root_distance']} ({lineage['root']})"),
+                html.P(f"Ancestors / Descendants: {ancestors} / {descendants}"),
+                html.P(f"Traces Back to a Non-AI Device: {'Yes' if lineage['non_ai_ancestor'] else 'No'}"),
+                html.P("Nearest Creep Risk in Lineage: " + (
+                    'None' if creep_distance < 0 else 'This device' if creep_distance == 0
+                    else f"{creep_distance} generation(s) up")),
+            ]
+        content.append(summary_link)
 
         return True, content
@@ -1,36 +1,462 @@
 # Loads and prepares data from the multi-sheet Excel file
 
+import datetime
+import hashlib
+import io
+import logging
+import os
+import pickle
 import re
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from collections.abc import Mapping
+
 import pandas as pd
+import shared_store
+from graph_utils import GraphIndex
+from metrics import timed, timer
+from search import SearchIndex
+
+WORKBOOK_PATH = "predicate_data_main.xlsx"
+
+# Specialty value for the network merged across every sheet
+ALL_SPECIALTIES = '__all__'
+
+# Cleaned sheets are pickled, one file per sheet, into a directory next to the workbook so
+# later starts skip the openpyxl parse. Sheet files are keyed on the sheet's content
+# fingerprint and the metadata file on the workbook's mtime and size; each is ignored once
+# its key changes. Bump CACHE_FORMAT whenever clean_sheet changes so stale caches are ignored.
+CACHE_FORMAT = 3
+
+DEFAULT_YEAR_RANGE = (2000, 2025)
 
-# Load all sheets from the Excel file into a dictionary
-all_sheets = pd.read_excel("predicate_data_main.xlsx", sheet_name=None)
+# Attach the merged graph to a memory-mapped store shared by every process (see shared_store.py)
+SHARED_STORE = os.environ.get('PREDICATE_SHARED_STORE', '0') == '1'
 
-# Extract numeric family identifier from device name
-def get_family(device):
-    match = re.match(r'(\d+)', str(device))
-    return int(match.group(1)) if match else None
+FILLED_COLUMNS = ['FDA', 'Creep', 'Predicate_Location', 'Device_Name', 'Device_Summary',
+                  'Short_Description', 'Secondary_Specialty', 'Classification',
+                  'Predicate', 'Company', 'Lead_Specialty', 'FDA_Pathway']
 
-# Clean and process each sheet
-for sheet_name, df in all_sheets.items():
+
+def cache_dir_for(workbook_path):
+    return os.path.splitext(workbook_path)[0] + '.cache'
+
+
+# Clean and process one sheet
+def clean_sheet(df):
     df.columns = df.columns.str.strip()
-    df['family'] = df['Device'].apply(get_family)
+
+    # Numeric family identifier from the leading digits of the device name
+    family = df['Device'].astype(str).str.extract(r'^(\d+)', expand=False)
+    df['family'] = pd.to_numeric(family)
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
 
     # Ensure all expected columns exist and are filled
-    for col in ['FDA', 'Creep', 'Predicate_Location', 'Device_Name', 'Device_Summary',
-                'Short_Description', 'Secondary_Specialty', 'Classification',
-                'Predicate', 'Company', 'Lead_Specialty', 'FDA_Pathway']:
+    for col in FILLED_COLUMNS:
         if col not in df.columns:
             df[col] = ''
         df[col] = df[col].fillna('')
+    return df
+
+
+# The workbook's mtime and size, recorded in the cache to tell whether it is still current
+def _workbook_stamp(workbook_path):
+    st = os.stat(workbook_path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_cache_file(path, source):
+    try:
+        cached = pd.read_pickle(path)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if (not isinstance(cached, dict) or cached.get('format') != CACHE_FORMAT
+            or cached.get('source') != source):
+        return None
+    return cached
+
+
+# Write a cache file atomically so a concurrently starting worker never reads a partial file
+def _write_cache_file(path, source, **payload):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pd.to_pickle({'format': CACHE_FORMAT, 'source': source, **payload}, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+_XLSX_NS = {
+    'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+}
+_XLSX_REL_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+
+# Sheet name -> worksheet XML part, in workbook order
+def _worksheet_parts(zf):
+    workbook = ET.fromstring(zf.read('xl/workbook.xml'))
+    rels = ET.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels.findall('rel:Relationship', _XLSX_NS)}
+    parts = {}
+    for sheet in workbook.findall('main:sheets/main:sheet', _XLSX_NS):
+        target = targets[sheet.get(_XLSX_REL_ID)]
+        parts[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+    return parts, workbook
+
+
+# Cheap metadata pass: the approval-year range of every sheet, read from the Date column of
+# the raw worksheet XML without building any DataFrames. Returns None when a Date column
+# can't be read this way (e.g. dates stored as text) so the caller can parse properly.
+def scan_year_range(workbook_path):
+    with zipfile.ZipFile(workbook_path) as zf:
+        parts, workbook = _worksheet_parts(zf)
+        date1904 = workbook.find('main:workbookPr', _XLSX_NS)
+        date1904 = date1904 is not None and date1904.get('date1904') in ('1', 'true')
+        origin = datetime.datetime(1904, 1, 1) if date1904 else datetime.datetime(1899, 12, 30)
+
+        strings = []
+
+        def shared_strings():
+            if not strings and 'xl/sharedStrings.xml' in zf.namelist():
+                root = ET.fromstring(zf.read('xl/sharedStrings.xml'))
+                strings.extend(''.join(si.itertext()) for si in root.findall('main:si', _XLSX_NS))
+            return strings
+
+        serials = []
+        for part in parts.values():
+            sheet_xml = zf.read(part)
+            header = re.search(rb'<row\b[^>]*>(.*?)</row>', sheet_xml, re.S)
+            if header is None:
+                continue
+            row = ET.fromstring(b'<row xmlns="' + _XLSX_NS['main'].encode() + b'">'
+                                + header.group(1) + b'</row>')
+            date_col = None
+            for cell in row.findall('main:c', _XLSX_NS):
+                if cell.get('t') == 's':
+                    text = shared_strings()[int(cell.findtext('main:v', '0', _XLSX_NS))]
+                else:
+                    text = ''.join(cell.itertext())
+                if text.strip() == 'Date':
+                    if cell.get('r') is None:
+                        return None
+                    date_col = cell.get('r').rstrip('0123456789').encode()
+            if date_col is None:
+                return None
+
+            # Every cell of the Date column, whatever the order of its attributes
+            cells = [cell for cell in re.findall(
+                rb'<c\b([^>]*?\br="' + date_col + rb'(\d+)"[^>]*?)(?:/>|>(.*?)</c>)', sheet_xml, re.S)
+                if cell[1] != b'1']
+            # Data rows whose Date cells can't be found this way: parse the workbook properly
+            if not cells and len(re.findall(rb'<row\b', sheet_xml)) > 1:
+                return None
+            for attrs, row_number, content in cells:
+                if not content:
+                    continue
+                # Text dates need pandas' parser; leave those workbooks to the full parse
+                if re.search(rb'\bt="(s|str|inlineStr|d)"', attrs):
+                    return None
+                value = re.search(rb'<v>([^<]*)</v>', content)
+                if value is None:
+                    continue
+                try:
+                    serials.append(float(value.group(1)))
+                except ValueError:
+                    return None
+
+    if not serials:
+        return DEFAULT_YEAR_RANGE
+    return ((origin + datetime.timedelta(days=min(serials))).year,
+            (origin + datetime.timedelta(days=max(serials))).year)
+
+
+# Content fingerprint of every worksheet. Shared-string references are replaced by the
+# strings themselves, so a sheet's fingerprint only changes when that sheet's cells change,
+# not when an edit elsewhere renumbers the workbook's shared string table.
+def sheet_fingerprints(workbook_path, names=None):
+    fingerprints = {}
+    with zipfile.ZipFile(workbook_path) as zf:
+        parts, _ = _worksheet_parts(zf)
+        strings = []
+        if 'xl/sharedStrings.xml' in zf.namelist():
+            root = ET.fromstring(zf.read('xl/sharedStrings.xml'))
+            strings = [''.join(si.itertext()).encode('utf-8')
+                       for si in root.findall('main:si', _XLSX_NS)]
+
+        def resolve(match):
+            return match.group(1) + b'<is>' + strings[int(match.group(2))] + b'</is></c>'
+
+        for name, part in parts.items():
+            if names is not None and name not in names:
+                continue
+            sheet_xml = re.sub(rb'(<c [^>]*t="s"[^>]*>)<v>(\d+)</v></c>', resolve, zf.read(part))
+            fingerprints[name] = hashlib.sha1(sheet_xml).hexdigest()
+    return fingerprints
+
+
+# The workbook's bytes, read in one go so everything derived from them sees one version
+# even if the file is saved again meanwhile
+def _read_workbook(workbook_path):
+    with open(workbook_path, 'rb') as f:
+        return io.BytesIO(f.read())
+
+
+# Raised when a snapshot needs a sheet the workbook on disk no longer holds the same content
+# for. The snapshot can't be completed; the reloader swaps in one of the new workbook.
+class WorkbookChanged(Exception):
+    pass
+
+
+# Lazily loaded snapshot of one version of the workbook. Only sheet names, content
+# fingerprints and the year range are read up front. The first graph requested loads every
+# sheet (from the sheet cache when it is current) to build the graph index over all of them,
+# which each sheet's graph is a projection of. A snapshot never changes once built: reloads
+# create a new one (reusing unchanged sheets from the old) and swap it in.
+class DataStore:
+    def __init__(self, workbook_path=WORKBOOK_PATH, use_cache=True, previous=None, shared=SHARED_STORE):
+        self.workbook_path = workbook_path
+        self.use_cache = use_cache
+        self.shared = shared
+        self.cache_dir = cache_dir_for(workbook_path)
+        self.stamp = _workbook_stamp(workbook_path)
+
+        self._sheets = {}
+        self._merged = None
+        self._search = None
+        self._indexes = {}
+        self._locks = {}
+        self._load_meta()
+
+        # Every specialty choice (each sheet, and all of them merged) -> content version
+        combined = hashlib.sha1('\n'.join(
+            f'{name}:{version}' for name, version in self.sheet_versions.items()).encode())
+        self.specialty_versions = {ALL_SPECIALTIES: combined.hexdigest(), **self.sheet_versions}
+
+        # Carry over whatever the previous snapshot already built for unchanged sheets
+        if previous is not None:
+            for name in self.sheet_names:
+                if previous.sheet_versions.get(name) == self.sheet_versions[name]:
+                    if name in previous._sheets:
+                        self._sheets[name] = previous._sheets[name]
+            if previous.specialty_versions[ALL_SPECIALTIES] == self.specialty_versions[ALL_SPECIALTIES]:
+                self._merged = previous._merged
+                self._search = previous._search
+                self._indexes = dict(previous._indexes)
+
+    def _meta_path(self):
+        return os.path.join(self.cache_dir, 'meta.pkl')
+
+    def _sheet_path(self, name):
+        return os.path.join(self.cache_dir, f'sheet_{self.sheet_versions[name]}.pkl')
+
+    # Sets sheet_names, sheet_versions (name -> content fingerprint, which caches of anything
+    # derived from a sheet are keyed on) and min_year/max_year
+    @timer('data.load_meta')
+    def _load_meta(self):
+        if self.use_cache:
+            cached = _read_cache_file(self._meta_path(), self.stamp)
+            if cached is not None:
+                self.sheet_names = cached['sheet_names']
+                self.sheet_versions = cached['sheet_versions']
+                self.min_year, self.max_year = cached['year_range']
+                return
+
+        content = _read_workbook(self.workbook_path)
+        self.sheet_versions = sheet_fingerprints(content)
+        self.sheet_names = list(self.sheet_versions)
+        year_range = scan_year_range(content)
+        if year_range is None:
+            # Fall back to the full parse; the sheets are kept since they were paid for
+            dates = [self.sheet(name)['Date'].dropna() for name in self.sheet_names]
+            combined_dates = pd.concat(dates) if dates else pd.Series(dtype='datetime64[ns]')
+            if combined_dates.empty:
+                year_range = DEFAULT_YEAR_RANGE
+            else:
+                year_range = (int(combined_dates.dt.year.min()), int(combined_dates.dt.year.max()))
+        self.min_year, self.max_year = year_range
+
+        if self.use_cache:
+            _write_cache_file(self._meta_path(), self.stamp, sheet_names=self.sheet_names,
+                              sheet_versions=self.sheet_versions, year_range=year_range)
+            self._remove_stale_cache_files()
+
+    # Drop cached sheets whose content no longer appears in the workbook
+    def _remove_stale_cache_files(self):
+        live = {os.path.basename(self._sheet_path(name)) for name in self.sheet_names}
+        try:
+            for filename in os.listdir(self.cache_dir):
+                if filename.startswith('sheet_') and filename.endswith('.pkl') and filename not in live:
+                    os.remove(os.path.join(self.cache_dir, filename))
+        except OSError:
+            pass
+
+    @timer('data.load_sheet')
+    def _load_sheet(self, name):
+        version = self.sheet_versions[name]
+        if self.use_cache:
+            cached = _read_cache_file(self._sheet_path(name), version)
+            if cached is not None:
+                return cached['sheet']
+
+        # The workbook may have been saved again since this snapshot was taken; only parse it
+        # if the sheet still has the content this snapshot (and its cache keys) expect
+        with timed('data.parse_sheet'):
+            content = _read_workbook(self.workbook_path)
+            if sheet_fingerprints(content, [name]).get(name) != version:
+                raise WorkbookChanged(f"sheet {name!r} of {self.workbook_path} changed since it was scanned")
+            content.seek(0)
+            df = clean_sheet(pd.read_excel(content, sheet_name=name))
+        if self.use_cache:
+            _write_cache_file(self._sheet_path(name), version, sheet=df)
+        return df
+
+    # Cleaned DataFrame for one sheet, loaded on first use
+    def sheet(self, name):
+        df = self._sheets.get(name)
+        if df is None:
+            with self._locks.setdefault(name, threading.Lock()):
+                df = self._sheets.get(name)
+                if df is None:
+                    df = self._sheets[name] = self._load_sheet(name)
+        return df
+
+    # GraphIndex over every sheet, with devices on several sheets merged into one node.
+    # Built once on first use; each sheet's graph is a projection of it.
+    def merged_index(self):
+        if self._merged is None:
+            with self._locks.setdefault(ALL_SPECIALTIES, threading.Lock()):
+                if self._merged is None:
+                    if self.shared:
+                        with timed('data.attach_shared'):
+                            self._merged = shared_store.attach(
+                                self.cache_dir, self.specialty_versions[ALL_SPECIALTIES], self._build_merged)
+                    else:
+                        self._merged = self._build_merged(keep_sheets=True)
+        return self._merged
+
+    # Sheets read only to build a shared store aren't kept: workers use the store instead
+    def _build_merged(self, keep_sheets=False):
+        load = self.sheet if keep_sheets else self._load_sheet
+        sheets = {name: load(name) for name in self.sheet_names}
+        with timed('data.merged_index'):
+            return GraphIndex.merged(sheets)
+
+    # Device search over every sheet, built on first use
+    def search_index(self):
+        if self._search is None:
+            with self._locks.setdefault('search', threading.Lock()):
+                if self._search is None:
+                    merged = self.merged_index()
+                    with timed('data.search_index'):
+                        self._search = SearchIndex(merged)
+        return self._search
+
+    # GraphIndex for one sheet, or the merged one for ALL_SPECIALTIES
+    def graph_index(self, name):
+        if name == ALL_SPECIALTIES:
+            return self.merged_index()
+        index = self._indexes.get(name)
+        if index is None:
+            if name not in self.sheet_versions:
+                raise KeyError(name)
+            index = self._indexes.setdefault(name, self.merged_index().project(name))
+        return index
+
+
+# Read-only mapping of sheet name -> value, loaded on access from whichever snapshot is current
+class LazySheetMapping(Mapping):
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getitem__(self, name):
+        store = get_store()
+        if name not in store.sheet_versions:
+            raise KeyError(name)
+        return self._loader(store, name)
+
+    def __iter__(self):
+        return iter(get_store().sheet_names)
+
+    def __len__(self):
+        return len(get_store().sheet_names)
+
+
+# Seconds between checks of the workbook's mtime; 0 disables hot reloading
+RELOAD_INTERVAL = float(os.environ.get('PREDICATE_RELOAD_INTERVAL', '30'))
+
+logger = logging.getLogger(__name__)
+
+_store = DataStore()
+_reload_lock = threading.Lock()
+_reload_hooks = []
+_reloader = None
+
+
+# The current snapshot. Callbacks should fetch it once and use it throughout, so a reload
+# that lands mid-request doesn't mix two versions of the workbook.
+def get_store():
+    return _store
+
+
+# Register hook(new_store), called after a reload has been swapped in
+def on_reload(hook):
+    _reload_hooks.append(hook)
+    return hook
+
+
+# Build a new snapshot if the workbook changed on disk and swap it in. Sheets whose content is
+# unchanged are carried over; the merged graph and search index, if they were in use, are
+# rebuilt before the swap so requests never wait on them. Returns True when a new snapshot was installed.
+@timer('data.reload')
+def reload_if_changed():
+    global _store
+    with _reload_lock:
+        old = _store
+        if _workbook_stamp(old.workbook_path) == old.stamp:
+            return False
+
+        new = DataStore(old.workbook_path, old.use_cache, previous=old, shared=old.shared)
+        changed = [name for name in new.sheet_names
+                   if old.sheet_versions.get(name) != new.sheet_versions[name]]
+        if old._merged is not None:
+            new.merged_index()
+        if old._search is not None:
+            new.search_index()
+        if _workbook_stamp(new.workbook_path) != new.stamp:
+            # Modified again while we were rebuilding; try again on the next poll
+            return False
+
+        _store = new
+    logger.info("Reloaded %s; changed sheets: %s", new.workbook_path, ', '.join(changed) or 'none')
+    for hook in _reload_hooks:
+        hook(new)
+    return True
+
+
+def _poll_workbook(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            reload_if_changed()
+        except Exception:
+            # Typically the workbook is mid-save; the next poll retries
+            logger.exception("Reloading %s failed", _store.workbook_path)
+
+
+# Start the background thread that polls the workbook for changes (once per process)
+def start_reloader(interval=RELOAD_INTERVAL):
+    global _reloader
+    if interval <= 0 or _reloader is not None:
+        return
+    _reloader = threading.Thread(target=_poll_workbook, args=(interval,), daemon=True,
+                                 name='workbook-reloader')
+    _reloader.start()
 
-# Determine the min and max approval years from all sheets
-all_dates = [df['Date'].dropna() for df in all_sheets.values() if 'Date' in df.columns]
 
-if all_dates:
-    combined_dates = pd.concat(all_dates)
-    min_year = combined_dates.dt.year.min()
-    max_year = combined_dates.dt.year.max()
-else:
-    min_year, max_year = 2000, 2025
+all_sheets = LazySheetMapping(DataStore.sheet)
+graph_indexes = LazySheetMapping(DataStore.graph_index)
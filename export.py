@@ -0,0 +1,145 @@
+# Headless batch export of figures and graph tables for reports, without the Dash UI.
+# Run from the directory holding predicate_data_main.xlsx, like app.py:
+#
+#   python export.py --out exports
+#   python export.py --out exports --specialty Radiology --fda all "De Novo" \
+#       --years 2000-2012 2013-2025 --figure html --tables parquet --workers 4
+#
+# Writes <out>/<specialty>/<pathway>_<start>-<end>.{json|html} plus _nodes and _edges tables
+# for every specialty x pathway x year-range combination.
+
+import argparse
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import data
+from graph_utils import DETAIL_COLUMNS, FDA_PATHWAYS, build_figure
+
+
+def _slug(value):
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(value)).strip('_') or 'x'
+
+
+def _specialty_dir(specialty):
+    return 'All_specialties' if specialty == data.ALL_SPECIALTIES else _slug(specialty)
+
+
+# Per-node table of one filtered graph: info-panel fields, plot position, component and lineage
+def node_table(view):
+    x, dates = view.positions()
+    nodes = pd.DataFrame({col: view.column(col) for col in DETAIL_COLUMNS})
+    nodes['Date'] = pd.to_datetime(view.index.date[view.last_rows])
+    nodes['family'] = view.index.family[view.first_rows]
+    nodes['plot_x'] = x
+    nodes['plot_date'] = pd.to_datetime(dates)
+    components = view.components()
+    nodes['component'] = components.labels
+    nodes['component_size'] = components.sizes[components.labels]
+    lineage = view.lineage_table().drop(columns=['Submission_Number', 'Device_Name'])
+    return pd.concat([nodes, lineage], axis=1)
+
+
+# Predicate -> device edge table of one filtered graph
+def edge_table(view):
+    node_ids = np.asarray(view.node_ids, dtype=object)
+    return pd.DataFrame({
+        'Predicate': node_ids[view.edge_src],
+        'Submission_Number': node_ids[view.edge_dst],
+    })
+
+
+def _write_table(df, path, fmt):
+    if fmt == 'csv':
+        df.to_csv(path + '.csv', index=False)
+        return path + '.csv'
+    df.to_parquet(path + '.parquet', index=False)
+    return path + '.parquet'
+
+
+# Export one specialty/pathway/years combination; returns the paths written.
+# Runs in a pool worker, reading the data snapshot loaded once by the parent process.
+def export_combination(specialty, fda_filter, year_range, out_dir, figure_format, table_format, lod):
+    index = data.get_store().graph_index(specialty)
+    base = os.path.join(out_dir, _specialty_dir(specialty),
+                        f'{_slug(fda_filter)}_{year_range[0]}-{year_range[1]}')
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    written = []
+
+    if figure_format != 'none':
+        fig = build_figure(index, fda_filter=fda_filter, year_range=year_range, lod=lod)
+        if figure_format == 'html':
+            fig.write_html(base + '.html', include_plotlyjs=True, full_html=True)
+            written.append(base + '.html')
+        else:
+            with open(base + '.json', 'w') as f:
+                f.write(fig.to_json())
+            written.append(base + '.json')
+
+    if table_format != 'none':
+        view = index.select(fda_filter, year_range)
+        written.append(_write_table(node_table(view), base + '_nodes', table_format))
+        written.append(_write_table(edge_table(view), base + '_edges', table_format))
+    return written
+
+
+def _parse_years(value):
+    match = re.fullmatch(r'(\d{4})-(\d{4})', value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected START-END, e.g. 2000-2025, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export predicate network figures and graph tables")
+    parser.add_argument('--out', default='exports', help='output directory')
+    parser.add_argument('--specialty', nargs='+',
+                        help="sheet names, or 'All' for the merged network (default: every sheet and All)")
+    parser.add_argument('--fda', nargs='+', default=FDA_PATHWAYS, choices=FDA_PATHWAYS,
+                        help='FDA pathway filters')
+    parser.add_argument('--years', nargs='+', type=_parse_years,
+                        help='year ranges as START-END (default: the full range)')
+    parser.add_argument('--figure', choices=['json', 'html', 'none'], default='json')
+    parser.add_argument('--tables', choices=['csv', 'parquet', 'none'], default='csv')
+    parser.add_argument('--full-detail', action='store_true',
+                        help='never aggregate large graphs into family/time bins')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    if args.tables == 'parquet':
+        try:
+            pd.io.parquet.get_engine('auto')
+        except ImportError as e:
+            parser.error(str(e))
+
+    # Load every sheet and the merged graph once; forked workers share it copy-on-write
+    store = data.get_store()
+    specialties = args.specialty or [data.ALL_SPECIALTIES] + store.sheet_names
+    specialties = [data.ALL_SPECIALTIES if name == 'All' else name for name in specialties]
+    unknown = [name for name in specialties if name not in store.specialty_versions]
+    if unknown:
+        parser.error(f"unknown specialty: {', '.join(unknown)}")
+    store.merged_index()
+
+    year_ranges = args.years or [(store.min_year, store.max_year)]
+    jobs = [(specialty, fda_filter, years) for specialty in specialties
+            for fda_filter in args.fda for years in year_ranges]
+    lod = False if args.full_detail else None
+
+    # Spawned workers (no fork on this platform) load the store themselves from the sheet cache
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+        futures = [pool.submit(export_combination, *job, args.out, args.figure, args.tables, lod)
+                   for job in jobs]
+        for future in as_completed(futures):
+            for path in future.result():
+                print(path)
+
+
+if __name__ == "__main__":
+    main()
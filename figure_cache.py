@@ -0,0 +1,170 @@
+# Bounded LRU cache for built figures, shared by all request threads of a worker
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from dash import Patch
+
+from graph_utils import build_figure
+from metrics import timed
+
+# Defaults sized for a handful of specialties x filter combinations on a small host
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+# Rough in-memory size of a plotly JSON-ready figure dict (or a DataFrame)
+def estimate_nbytes(obj):
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return obj.size * 8 + sum(estimate_nbytes(v) for v in obj.ravel())
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(estimate_nbytes(k) + estimate_nbytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return len(obj) * 8 + sum(estimate_nbytes(v) for v in obj)
+    if isinstance(obj, str):
+        return len(obj)
+    return 8
+
+
+def _same(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return (isinstance(a, np.ndarray) and isinstance(b, np.ndarray)
+                and a.dtype == b.dtype and np.array_equal(a, b))
+    return type(a) is type(b) and a == b
+
+
+def _diff_into(patch, old, new):
+    for key, value in new.items():
+        before = old.get(key)
+        if isinstance(value, dict) and isinstance(before, dict):
+            _diff_into(patch[key], before, value)
+        elif key not in old or not _same(before, value):
+            patch[key] = value
+    for key in old.keys() - new.keys():
+        del patch[key]
+
+
+# A dash.Patch turning figure dict `old` into `new`, setting only the trace and layout
+# properties that differ (unchanged legend traces and layout are never resent), or None
+# when the two figures' traces don't line up one to one
+def figure_patch(old, new):
+    old_traces, new_traces = old.get('data', []), new.get('data', [])
+    if len(old_traces) != len(new_traces) or any(
+            a.get('type') != b.get('type') or a.get('meta') != b.get('meta')
+            for a, b in zip(old_traces, new_traces)):
+        return None
+    patch = Patch()
+    for i, (a, b) in enumerate(zip(old_traces, new_traces)):
+        _diff_into(patch['data'][i], a, b)
+    _diff_into(patch['layout'], old.get('layout', {}), new.get('layout', {}))
+    return patch
+
+
+# Figures are stored as the dicts returned by Figure.to_plotly_json(), which Dash can
+# serialize directly. Entries are evicted least-recently-used first once either the
+# entry count or the estimated byte total goes over its limit.
+class FigureCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, figure):
+        nbytes = estimate_nbytes(figure)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            self._entries[key] = (figure, nbytes)
+            self._nbytes += nbytes
+            while len(self._entries) > self.max_entries or self._nbytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_bytes
+                self.evictions += 1
+
+    # Return the cached figure for key, building and storing it on a miss.
+    # The build runs outside the lock so a slow miss never blocks hits on other keys.
+    def get_or_build(self, key, build):
+        figure = self.get(key)
+        if figure is None:
+            figure = build()
+            if hasattr(figure, 'to_plotly_json'):
+                with timed('figure_cache.to_plotly_json'):
+                    figure = figure.to_plotly_json()
+            self.put(key, figure)
+        return figure
+
+    # Remove every entry whose key matches predicate
+    def discard(self, predicate):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                _, nbytes = self._entries.pop(key)
+                self._nbytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'nbytes': self._nbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+figure_cache = FigureCache()
+
+
+# Cache key of one specialty/filter combination of a data snapshot. Keys start with the
+# specialty's content version, so a reload only invalidates changed sheets.
+def figure_key(store, specialty, fda_filter='all', year_range=None, highlight_node=None):
+    return (store.specialty_versions[specialty], specialty, fda_filter,
+            tuple(year_range) if year_range else None, highlight_node)
+
+
+# figure_key as stored in the browser (JSON turns tuples into lists) back to a key. Keys of
+# zoomed windows carry the window as a sixth item.
+def key_from_json(data):
+    if not data:
+        return None
+    key = list(data)
+    key[3] = tuple(key[3]) if key[3] else None
+    if len(key) > 5:
+        key[5] = tuple(tuple(axis) if axis else None for axis in key[5])
+    return tuple(key)
+
+
+# Figure for one specialty/filter combination of a data snapshot, built on a cache miss
+def cached_figure(store, specialty, fda_filter='all', year_range=None, highlight_node=None):
+    key = figure_key(store, specialty, fda_filter, year_range, highlight_node)
+    return figure_cache.get_or_build(key, lambda: build_figure(
+        store.graph_index(specialty), fda_filter=fda_filter, year_range=year_range,
+        highlight_node=highlight_node))
@@ -1,132 +1,719 @@
 # Contains graph-building utilities for predicate network visualization
 
+import copy
 import datetime
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
-import networkx as nx
 import plotly.graph_objects as go
 
-# Traverse predecessors/successors to get connected subgraph
-
-def get_subgraph_nodes_bfs(G, root):
-    visited = set()
-    stack = [root]
-    while stack:
-        current = stack.pop()
-        if current not in visited and current in G:
-            visited.add(current)
-            neighbors = list(G.predecessors(current)) + list(G.successors(current))
-            stack.extend(neighbors)
-    return visited
-
-# Build the Plotly figure from a DataFrame (filtered by specialty, year, etc.)
-def build_figure(df, fda_filter='all', year_range=None, highlight_node=None):
-    if fda_filter != 'all':
-        df = df[df['FDA'] == fda_filter]
-
-    if year_range:
-        start_year, end_year = year_range
-        start_date = datetime.datetime(start_year, 1, 1)
-        end_date = datetime.datetime(end_year, 12, 31)
-        df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-
-    # Build the graph
-    G = nx.DiGraph()
-    for _, row in df.iterrows():
-        device_id = row['Submission_Number']
-        G.add_node(device_id, **{
-            'date': row['Date'],
-            'family': row['family'],
-            'fda': row['FDA'],
-            'creep': row['Creep'],
-            'predloc': row['Predicate_Location'],
-            'device_name': row['Device_Name'],
-            'device_summary': row['Device_Summary'],
-            'classification': row['Classification'],
-            'node_predicate': row['Predicate'],
-            'company': row['Company'],
-            'leadspec': row['Lead_Specialty'],
-            'secondspec': row['Secondary_Specialty'],
-            'shortdesc': row['Short_Description']
+from metrics import timed, timer
+
+# Color and symbol maps
+predicate_location_color_map = {
+    'Specialty AI device': '#909090',
+    'Other AI device': '#7899B2',
+    'Non AI device': '#D96459',
+    'No predicate': '#78A085'
+}
+fda_symbol_map = {
+    '510(k)': 'circle',
+    'De Novo': 'triangle-up',
+    'Premarket': 'cross'
+}
+
+# Values of the FDA pathway filter: every pathway, or 'all' of them
+FDA_PATHWAYS = ['all'] + list(fda_symbol_map)
+
+# Edges are drawn as one None-separated line trace per color, in this fixed order,
+# so the number of traces never depends on the number of edges. Each color also gets
+# an overlay trace holding only the highlighted network's edges.
+EDGE_DEFAULT_COLOR = 'black'
+EDGE_DIM_COLOR = 'rgba(150,150,150,0.2)'
+NODE_DIM_COLOR = 'rgba(200,200,200,0.2)'
+EDGE_COLORS = list(predicate_location_color_map.values()) + [EDGE_DEFAULT_COLOR]
+
+NODE_COLORS = list(predicate_location_color_map.values()) + ['grey']
+NODE_SYMBOLS = list(fda_symbol_map.values()) + ['circle']
+
+# Figures with more visible nodes than this draw nodes and edges with WebGL (Scattergl)
+# instead of SVG, which keeps pan and zoom responsive on the large specialties
+WEBGL_NODE_THRESHOLD = int(os.environ.get('PREDICATE_WEBGL_THRESHOLD', '2000'))
+
+# Level of detail: when more nodes than this fall inside the plotted window they are
+# binned into at most LOD_FAMILY_BINS x LOD_TIME_BINS aggregate markers joined by at most
+# LOD_MAX_EDGES merged edges, so figure size follows the screen rather than the data
+LOD_NODE_THRESHOLD = int(os.environ.get('PREDICATE_LOD_THRESHOLD', '5000'))
+LOD_FAMILY_BINS = 60
+LOD_TIME_BINS = 60
+LOD_MAX_EDGES = 4000
+AGGREGATE_EDGE_COLOR = 'rgba(80,80,80,0.35)'
+DAY_NS = 24 * 3600 * 10**9
+
+# Devices of one family sharing an approval date are spread across the family's column,
+# JITTER_STEP apart and centred on it, or closer when a group would be wider than JITTER_WIDTH
+JITTER_STEP = 0.12
+JITTER_WIDTH = 0.6
+
+# Trace roles, stored in each trace's meta so assets/highlight.js can find them
+NODE_ROLE = 'nodes'
+EDGE_ROLE = 'edges'
+EDGE_HIGHLIGHT_ROLE = 'edges-highlight'
+AGGREGATE_NODE_ROLE = 'aggregate-nodes'
+AGGREGATE_EDGE_ROLE = 'aggregate-edges'
+
+# Weakly connected components by union-find over an edge list of node indices.
+# Every round hooks each root onto the smallest root it shares an edge with, then
+# compresses paths until every node points straight at its root. Roots are always
+# the smallest node index of their component.
+def union_find_roots(n_nodes, src, dst):
+    parent = np.arange(n_nodes)
+    while True:
+        root_src, root_dst = parent[src], parent[dst]
+        pending = root_src != root_dst
+        if not pending.any():
+            return parent
+        lo = np.minimum(root_src[pending], root_dst[pending])
+        hi = np.maximum(root_src[pending], root_dst[pending])
+        np.minimum.at(parent, hi, lo)
+        while True:
+            grand = parent[parent]
+            if (grand == parent).all():
+                break
+            parent = grand
+
+
+# Component labels and members of one GraphView. Labels are numbered in order of each
+# component's first node, and members are stored grouped by label (offsets into
+# member_nodes) so one component comes back in time proportional to its size.
+class ComponentIndex:
+    def __init__(self, n_nodes, src, dst):
+        roots = union_find_roots(n_nodes, src, dst)
+        is_root = roots == np.arange(n_nodes)
+        self.labels = (np.cumsum(is_root) - 1).astype(np.int32)[roots]
+        self.sizes = np.bincount(self.labels, minlength=int(is_root.sum()))
+        self.offsets = np.concatenate([[0], np.cumsum(self.sizes)])
+        self.member_nodes = np.argsort(self.labels, kind='stable')
+
+    def __len__(self):
+        return len(self.sizes)
+
+    # Local node indices of one component, in node order
+    def members(self, label):
+        return self.member_nodes[self.offsets[label]:self.offsets[label + 1]]
+
+
+# Adjacency of an edge list as (offsets, targets): the targets of node i are
+# targets[offsets[i]:offsets[i + 1]]
+def _adjacency(n_nodes, src, dst):
+    offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_nodes), out=offsets[1:])
+    return offsets, dst[np.argsort(src, kind='stable')]
+
+
+# Concatenated targets of every node in nodes
+def _neighbours(offsets, targets, nodes):
+    starts = offsets[nodes]
+    lengths = offsets[nodes + 1] - starts
+    shift = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return targets[shift + np.arange(lengths.sum())]
+
+
+# Bytes of reachability bitsets _reach_counts holds at once, and the largest component whose
+# ancestor/descendant counts are made exact with it
+REACH_BLOCK_BYTES = 64 * 1024 * 1024
+REACH_EXACT_NODES = 20000
+
+
+# Set bits in each row of a uint64 array. np.bitwise_count needs NumPy 2; older versions
+# count bytes through a lookup table instead.
+_BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _row_popcounts(bits):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+    return _BYTE_BITS[bits.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+# Number of distinct nodes with a path to each node along edges src -> dst, by OR-ing bitsets
+# of predecessors forward one edge group at a time. Edges are processed in increasing step,
+# and every edge into an edge's source must have a smaller step (e.g. the target's level).
+# Bit column[i] stands for node i within its component, so a node's bitset needs only
+# size[i] bits; nodes with size 0 are skipped, and edges must join nodes of one component.
+# Work and memory grow with the sum of squared component sizes, held to REACH_BLOCK_BYTES
+# by handling the columns a block at a time.
+def _reach_counts(n_nodes, src, dst, step, column, size):
+    counts = np.zeros(n_nodes, dtype=np.int64)
+    order = np.argsort(step, kind='stable')
+    src, dst, step = src[order], dst[order], step[order]
+    start = 0
+    while True:
+        rows = np.flatnonzero(size > start)
+        if not len(rows):
+            return counts
+        width = max(64, REACH_BLOCK_BYTES * 8 // len(rows)) // 64 * 64
+        row_of = np.full(n_nodes, -1, dtype=np.int64)
+        row_of[rows] = np.arange(len(rows))
+        bits = np.zeros((len(rows), width // 64), dtype=np.uint64)
+
+        keep = size[src] > start
+        s, d, k = row_of[src[keep]], row_of[dst[keep]], step[keep]
+        col = column[src[keep]] - start
+        inside = np.flatnonzero((col >= 0) & (col < width))
+        word = np.full(len(col), -1, dtype=np.int64)
+        word[inside] = col[inside] // 64
+        bit = np.zeros(len(col), dtype=np.uint64)
+        bit[inside] = np.left_shift(np.uint64(1), (col[inside] % 64).astype(np.uint64))
+
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(k)) + 1, [len(k)]])
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            group = np.arange(a, b)[np.argsort(d[a:b], kind='stable')]
+            values = bits[s[group]]
+            own = np.flatnonzero(word[group] >= 0)
+            values[own, word[group][own]] |= bit[group][own]
+            targets = d[group]
+            first = np.flatnonzero(np.concatenate([[True], targets[1:] != targets[:-1]]))
+            bits[targets[first]] |= np.bitwise_or.reduceat(values, first, axis=0)
+
+        counts[rows] += _row_popcounts(bits)
+        start += width
+
+
+# Edge steps from start to every node reachable from it: 0 for start, -1 where unreachable
+def _reach_distances(offsets, targets, start):
+    distance = np.full(len(offsets) - 1, -1, dtype=np.int64)
+    distance[start] = 0
+    frontier = np.array([start])
+    step = 0
+    while len(frontier):
+        step += 1
+        reached = _neighbours(offsets, targets, frontier)
+        frontier = np.unique(reached[distance[reached] < 0])
+        distance[frontier] = step
+    return distance
+
+
+# Plotted x of every row: its family, offset so that distinct devices sharing a (family, date)
+# point (within the same row_group, when given) don't overlap. Devices in a group are ordered
+# by their first row, so offsets only depend on the sheet, never on the filters applied.
+# Rows without a submission number (row_node -1) are never drawn and keep their family.
+def _jittered_x(family, date, row_node, row_group=None):
+    keys = pd.DataFrame({'family': family, 'date': date})
+    if row_group is not None:
+        keys['group'] = row_group
+    group = keys.groupby(list(keys.columns), sort=False, dropna=False).ngroup().to_numpy()
+    x = family.astype(float)
+    listed = row_node >= 0
+    if not listed.any():
+        return x
+    n_nodes = int(row_node.max()) + 1
+    pair, pairs = pd.factorize(group[listed].astype(np.int64) * n_nodes + row_node[listed])
+    pair_group = pairs // n_nodes
+    rank = pd.Series(pair_group).groupby(pair_group).cumcount().to_numpy()
+    size = np.bincount(pair_group)[pair_group]
+    step = np.minimum(JITTER_STEP, JITTER_WIDTH / np.maximum(size - 1, 1))
+    offset = (rank - (size - 1) / 2) * step
+    x[listed] += offset[pair]
+    return x
+
+
+# Kahn's algorithm a whole level at a time: level[i] is the length of the longest edge path
+# ending at node i, or -1 for nodes on or behind a cycle
+def _topological_levels(n_nodes, src, dst):
+    offsets, children = _adjacency(n_nodes, src, dst)
+    remaining = np.bincount(dst, minlength=n_nodes)
+    level = np.full(n_nodes, -1, dtype=np.int64)
+    frontier = np.flatnonzero(remaining == 0)
+    depth = 0
+    while len(frontier):
+        level[frontier] = depth
+        reached = _neighbours(offsets, children, frontier)
+        np.subtract.at(remaining, reached, 1)
+        frontier = np.unique(reached[remaining[reached] == 0])
+        depth += 1
+    return level
+
+
+# Predicate-lineage metrics of every node of a GraphView, with edges running from predicate
+# to device:
+#   depth             longest predicate chain above the device
+#   root_distance     shortest chain up to a device without a predicate in the view
+#   root              that root device (local index)
+#   ancestors         distinct devices the device descends from (-1 = not counted)
+#   descendants       distinct devices descending from it (-1 = not counted)
+#   non_ai_ancestor   whether the lineage reaches a "Non AI device" predicate
+#   creep_distance    generations up to the nearest creep-flagged device (0 = itself, -1 = none)
+# Every pass but the exact counts walks each edge once, one vectorised step per level of the
+# topological order, so time is linear in the edges plus one step per level of the longest chain.
+# Ancestor counts are summed down single-predicate chains and descendant counts up to them,
+# which is exact while no chain merges: above a device with one predicate whose own lineage
+# is a tree, or below a device whose descendants each have one predicate. In components where
+# chains merge, counts are taken exactly with _reach_counts instead, whose time and memory are
+# quadratic in the component's size (one bit per node pair, in blocks of REACH_BLOCK_BYTES).
+# Components over REACH_EXACT_NODES are left out of that; their devices whose count the chain
+# sums can't give exactly get -1.
+# Cycles (bad data) are broken at edges pointing to an earlier node.
+class Lineage:
+    def __init__(self, n_nodes, src, dst, non_ai, creep):
+        keep = src != dst
+        src, dst = src[keep], dst[keep]
+        level = _topological_levels(n_nodes, src, dst)
+        if (level < 0).any():
+            cyclic = level < 0
+            keep = ~(cyclic[src] & cyclic[dst] & (dst < src))
+            src, dst = src[keep], dst[keep]
+            level = _topological_levels(n_nodes, src, dst)
+
+        n_parents = np.bincount(dst, minlength=n_nodes)
+        n_levels = int(level.max()) + 1 if n_nodes else 0
+
+        self.depth = level
+        self.root_distance = np.where(n_parents == 0, 0, n_nodes).astype(np.int64)
+        self.root = np.arange(n_nodes)
+        self.ancestors = np.zeros(n_nodes, dtype=np.int64)
+        self.descendants = np.zeros(n_nodes, dtype=np.int64)
+        self.non_ai_ancestor = non_ai.astype(bool).copy()
+        creep_distance = np.where(creep, 0, n_nodes).astype(np.int64)
+        # Whether the chain sums count a node's ancestors / descendants exactly
+        tree_above = n_parents <= 1
+        tree_below = np.ones(n_nodes, dtype=bool)
+
+        # Downwards: edges grouped by the level of the device they point to
+        order = np.argsort(level[dst], kind='stable')
+        bounds = np.searchsorted(level[dst][order], np.arange(n_levels + 1))
+        for lvl in range(1, n_levels):
+            e = order[bounds[lvl]:bounds[lvl + 1]]
+            s, d = src[e], dst[e]
+            np.minimum.at(self.root_distance, d, self.root_distance[s] + 1)
+            nearest = self.root_distance[s] + 1 == self.root_distance[d]
+            self.root[d[nearest]] = self.root[s[nearest]]
+            np.logical_or.at(self.non_ai_ancestor, d, self.non_ai_ancestor[s])
+            np.minimum.at(creep_distance, d, creep_distance[s] + 1)
+            single = n_parents[d] == 1
+            self.ancestors[d[single]] = self.ancestors[s[single]] + 1
+            tree_above[d[single]] = tree_above[s[single]]
+
+        # Upwards: edges grouped by the level of the predicate they start from
+        order = np.argsort(level[src], kind='stable')
+        bounds = np.searchsorted(level[src][order], np.arange(n_levels + 1))
+        for lvl in range(n_levels - 1, -1, -1):
+            e = order[bounds[lvl]:bounds[lvl + 1]]
+            s, d = src[e], dst[e]
+            np.add.at(self.descendants, s, self.descendants[d] + 1)
+            np.logical_and.at(tree_below, s, tree_below[d] & (n_parents[d] == 1))
+
+        # Exact counts in components where chains merge, up to REACH_EXACT_NODES devices
+        roots = union_find_roots(n_nodes, src, dst)
+        size = np.bincount(roots, minlength=n_nodes)[roots]
+        merging = np.zeros(n_nodes, dtype=bool)
+        merging[roots[n_parents > 1]] = True
+        merging = merging[roots]
+        exact = merging & (size <= REACH_EXACT_NODES)
+        if exact.any():
+            member_order = np.argsort(roots, kind='stable')
+            sorted_roots = roots[member_order]
+            first = np.searchsorted(sorted_roots, sorted_roots)
+            column = np.empty(n_nodes, dtype=np.int64)
+            column[member_order] = np.arange(n_nodes) - first
+            size = np.where(exact, size, 0)
+            e = exact[src]
+            s, d = src[e], dst[e]
+            self.ancestors[exact] = _reach_counts(n_nodes, s, d, level[d], column, size)[exact]
+            self.descendants[exact] = _reach_counts(n_nodes, d, s, -level[s], column, size)[exact]
+        uncounted = merging & ~exact
+        self.ancestors[uncounted & ~tree_above] = -1
+        self.descendants[uncounted & ~tree_below] = -1
+
+        self.creep_distance = np.where(creep_distance < n_nodes, creep_distance, -1)
+
+
+# Columns shipped with every node for the hover box, in customdata order. The info panel's
+# other fields are looked up server-side with GraphIndex.node_details when a node is clicked.
+HOVER_COLUMNS = ['Submission_Number', 'Device_Name', 'Date']
+DETAIL_COLUMNS = ['Submission_Number', 'Device_Name', 'Device_Summary', 'Classification',
+                  'Predicate', 'Date', 'FDA', 'Creep', 'Company', 'Lead_Specialty',
+                  'Secondary_Specialty', 'Short_Description']
+
+
+# Per-node lineage metrics, in table column order (see Lineage)
+LINEAGE_COLUMNS = ['depth', 'root_distance', 'root', 'ancestors', 'descendants',
+                   'non_ai_ancestor', 'creep_distance']
+# Lineage counts that are -1 where they weren't counted (None in lineage_of, NA in tables)
+UNCOUNTED_COLUMNS = ['ancestors', 'descendants']
+NON_AI_LOCATION_CODE = list(predicate_location_color_map).index('Non AI device')
+
+
+# Format datetime64 values as ISO strings, dropping the time part when every value is at midnight
+def _date_strings(dates, missing=None):
+    missing_mask = np.isnat(dates)
+    unit = 's'
+    if (dates[~missing_mask] == dates[~missing_mask].astype('datetime64[D]')).all():
+        unit = 'D'
+    out = np.datetime_as_string(dates, unit=unit).astype(object)
+    out[missing_mask] = missing
+    return out
+
+
+# Column-oriented index over one cleaned sheet, built once and then filtered with boolean masks.
+# Rows keep their sheet order; every distinct submission number gets an integer node code
+# in order of first appearance and predicates are resolved to node codes up front.
+class GraphIndex:
+    # Filter combinations whose GraphView (and component index) is kept per sheet
+    MAX_CACHED_VIEWS = 32
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.sheet_names = []
+        self.row_sheet = None
+        self.base_mask = None
+        row_node, self.node_ids = pd.factorize(df['Submission_Number'])
+        self.row_node = row_node.astype(np.int32)
+        self.node_codes = pd.Index(self.node_ids)
+
+        pred = df['Predicate']
+        has_pred = (pred.astype(bool) & (pred != "N/A")).to_numpy()
+        row_pred = self.node_codes.get_indexer(pred)
+        self.row_pred = np.where(has_pred, row_pred, -1).astype(np.int32)
+
+        self.date = df['Date'].to_numpy(dtype='datetime64[ns]')
+        self.family = df['family'].to_numpy()
+
+        # Layout, computed once: plotted x (family plus jitter) and date labels of every row
+        self.x = _jittered_x(self.family, self.date, self.row_node)
+        self.date_text = _date_strings(self.date)
+        fda_codes, self.fda_values = pd.factorize(df['FDA'])
+        self.fda_codes = fda_codes.astype(np.int16)
+        self.predloc_codes = pd.Categorical(
+            df['Predicate_Location'], categories=list(predicate_location_color_map)).codes
+        self.symbol_codes = pd.Categorical(df['FDA'], categories=list(fda_symbol_map)).codes
+        self.columns = {col: df[col].to_numpy(dtype=object) for col in DETAIL_COLUMNS}
+        self.n_nodes = len(self.node_ids)
+        self._views = OrderedDict()
+        self._views_lock = threading.Lock()
+
+    # One index over several sheets (name -> cleaned DataFrame). A device listed on more than
+    # one sheet becomes a single node, so predicate chains that cross specialties connect.
+    @classmethod
+    def merged(cls, sheets):
+        names = list(sheets)
+        index = cls(pd.concat([sheets[name] for name in names], ignore_index=True))
+        index.sheet_names = names
+        index.row_sheet = np.repeat(np.arange(len(names), dtype=np.int16),
+                                    [len(sheets[name]) for name in names])
+        # The merged view spreads devices of every sheet at a shared point; each sheet's
+        # projection uses positions jittered within that sheet only
+        index.sheet_x = _jittered_x(index.family, index.date, index.row_node, index.row_sheet)
+        return index
+
+    # Per-row numeric arrays of a merged index. With node_ids, date_text, the detail columns
+    # and fda_values they describe it completely (see from_arrays and shared_store.py).
+    ROW_ARRAYS = ['row_node', 'row_pred', 'row_sheet', 'date', 'family', 'x', 'sheet_x',
+                  'fda_codes', 'predloc_codes', 'symbol_codes']
+
+    # A merged index over arrays built earlier, e.g. memory-mapped from a shared store.
+    # The arrays are only read, never copied.
+    @classmethod
+    def from_arrays(cls, arrays, node_ids, date_text, columns, fda_values, sheet_names):
+        index = cls.__new__(cls)
+        for name in cls.ROW_ARRAYS:
+            setattr(index, name, arrays[name])
+        index.n_rows = len(index.row_node)
+        index.sheet_names = list(sheet_names)
+        index.base_mask = None
+        index.node_ids = node_ids
+        index.node_codes = pd.Index(node_ids)
+        index.date_text = date_text
+        index.fda_values = fda_values
+        index.columns = columns
+        index.n_nodes = len(node_ids)
+        index._views = OrderedDict()
+        index._views_lock = threading.Lock()
+        return index
+
+    # The graph of one sheet of a merged index. It shares every array with the merged index
+    # and only restricts the rows (leaving out rows without a submission number, as row_mask
+    # does), so it shows exactly what an index of that sheet alone would.
+    def project(self, sheet_name):
+        projection = copy.copy(self)
+        projection.base_mask = (self.row_sheet == self.sheet_names.index(sheet_name)) & (self.row_node >= 0)
+        projection.x = self.sheet_x
+        projection.n_nodes = len(np.unique(self.row_node[projection.base_mask]))
+        projection._views = OrderedDict()
+        projection._views_lock = threading.Lock()
+        return projection
+
+    def __len__(self):
+        return self.n_nodes
+
+    def __contains__(self, submission_number):
+        return len(self._rows_of(submission_number)) > 0
+
+    # Rows listing one submission number, in sheet order
+    def _rows_of(self, submission_number):
+        code = self.node_codes.get_indexer([submission_number])[0]
+        if code < 0:
+            return np.empty(0, dtype=np.intp)
+        rows = np.flatnonzero(self.row_node == code)
+        return rows if self.base_mask is None else rows[self.base_mask[rows]]
+
+    # Boolean row mask for the FDA pathway and approval-year filters
+    def row_mask(self, fda_filter='all', year_range=None):
+        mask = self.row_node >= 0 if self.base_mask is None else self.base_mask.copy()
+        if fda_filter != 'all':
+            code = self.fda_values.get_indexer([fda_filter])[0]
+            mask &= (self.fda_codes == code) & (code >= 0)
+
+        if year_range:
+            start_year, end_year = year_range
+            start_date = np.datetime64(datetime.datetime(start_year, 1, 1))
+            end_date = np.datetime64(datetime.datetime(end_year, 12, 31))
+            mask &= (self.date >= start_date) & (self.date <= end_date)
+        return mask
+
+    # Info-panel fields of one device, taken from the row a figure with the same filters
+    # shows for it (the last visible row), or from its last row if none is visible
+    def node_details(self, submission_number, fda_filter='all', year_range=None):
+        rows = self._rows_of(submission_number)
+        if not len(rows):
+            return None
+        visible = rows[self.row_mask(fda_filter, year_range)[rows]]
+        row = visible[-1] if len(visible) else rows[-1]
+
+        details = {col: values[row] for col, values in self.columns.items()}
+        details['Date'] = details['Date'].strftime('%Y-%m-%d') if pd.notna(details['Date']) else ''
+        return details
+
+    # GraphView for one filter combination, reused (least recently used first out)
+    # across figures, searches and component lookups
+    def select(self, fda_filter='all', year_range=None):
+        key = (fda_filter, tuple(year_range) if year_range else None)
+        with self._views_lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+        view = GraphView(self, self.row_mask(fda_filter, year_range))
+        with self._views_lock:
+            view = self._views.setdefault(key, view)
+            while len(self._views) > self.MAX_CACHED_VIEWS:
+                self._views.popitem(last=False)
+        return view
+
+    # Submission numbers in the same network as submission_number under the filters
+    def network(self, submission_number, fda_filter='all', year_range=None):
+        return self.select(fda_filter, year_range).network(submission_number)
+
+    # Component ID and component size of every visible node, in bulk
+    def component_table(self, fda_filter='all', year_range=None):
+        return self.select(fda_filter, year_range).component_table()
+
+    # Lineage metrics (see Lineage) of one device under the filters, or None if not visible
+    def lineage(self, submission_number, fda_filter='all', year_range=None):
+        return self.select(fda_filter, year_range).lineage_of(submission_number)
+
+    def lineage_table(self, fda_filter='all', year_range=None):
+        return self.select(fda_filter, year_range).lineage_table()
+
+
+# The nodes and edges of a GraphIndex visible under one row mask. A submission number
+# on several visible rows takes its attributes from the last of them and its position
+# from the first, and nodes are ordered by first visible appearance.
+class GraphView:
+    def __init__(self, index, mask):
+        self.index = index
+        rows = np.flatnonzero(mask)
+        codes = index.row_node[rows]
+
+        unique_codes, first_pos = np.unique(codes, return_index=True)
+        _, last_pos_rev = np.unique(codes[::-1], return_index=True)
+        last_pos = len(codes) - 1 - last_pos_rev
+        order = np.argsort(first_pos, kind='stable')
+
+        self.node_codes = unique_codes[order]
+        self.first_rows = rows[first_pos[order]]
+        self.last_rows = rows[last_pos[order]]
+
+        local = np.full(len(index.node_ids), -1, dtype=np.int64)
+        local[self.node_codes] = np.arange(len(self.node_codes))
+        self.local = local
+        self._components = None
+        self._lineage = None
+        self._adjacencies = {}
+
+        # Keep one edge per (predicate, device) pair, ordered like DiGraph.edges()
+        edge_rows = rows[index.row_pred[rows] >= 0]
+        src = local[index.row_pred[edge_rows]]
+        dst = local[index.row_node[edge_rows]]
+        keep = src >= 0
+        src, dst = src[keep], dst[keep]
+        _, first_edge = np.unique(src * len(self.node_codes) + dst, return_index=True)
+        first_edge = first_edge[np.lexsort((first_edge, src[first_edge]))]
+        self.edge_src = src[first_edge]
+        self.edge_dst = dst[first_edge]
+
+    def __len__(self):
+        return len(self.node_codes)
+
+    @property
+    def node_ids(self):
+        return self.index.node_ids[self.node_codes]
+
+    # Attribute column values for each visible node
+    def column(self, name):
+        return self.index.columns[name][self.last_rows]
+
+    # Plotted (x, date) of each visible node, taken from its first visible row
+    def positions(self):
+        return self.index.x[self.first_rows], self.index.date[self.first_rows]
+
+    # Date labels matching positions()
+    def date_labels(self):
+        return self.index.date_text[self.first_rows]
+
+    # Nodes whose (family, date) position lies inside the plotted x/y window;
+    # a range of None covers the whole axis and y bounds may be date strings
+    def window_mask(self, x_range=None, y_range=None):
+        x, y = self.positions()
+        mask = np.ones(len(self), dtype=bool)
+        if x_range is not None:
+            lo, hi = sorted(float(v) for v in x_range)
+            mask &= (x >= lo) & (x <= hi)
+        if y_range is not None:
+            lo, hi = sorted(pd.Timestamp(v).to_datetime64() for v in y_range)
+            mask &= (y >= lo) & (y <= hi)
+        return mask
+
+    # Weakly connected components of the visible nodes, computed once per view
+    def components(self):
+        if self._components is None:
+            self._components = ComponentIndex(len(self), self.edge_src, self.edge_dst)
+        return self._components
+
+    # Local index of a visible submission number, or -1
+    def local_index(self, submission_number):
+        code = self.index.node_codes.get_indexer([submission_number])[0]
+        return self.local[code] if code >= 0 else -1
+
+    # Submission numbers of the network containing submission_number (empty if not visible)
+    def network(self, submission_number):
+        node = self.local_index(submission_number)
+        if node < 0:
+            return self.index.node_ids[:0]
+        components = self.components()
+        return self.node_ids[components.members(components.labels[node])]
+
+    # Predicate -> device adjacency of the visible nodes (device -> predicate when reverse),
+    # built once per view
+    def adjacency(self, reverse=False):
+        if reverse not in self._adjacencies:
+            src, dst = (self.edge_dst, self.edge_src) if reverse else (self.edge_src, self.edge_dst)
+            self._adjacencies[reverse] = _adjacency(len(self), src, dst)
+        return self._adjacencies[reverse]
+
+    # Visible ancestors (reverse) or descendants of a local node and the generations between
+    # them, nearest first
+    def relatives(self, node, reverse=False):
+        distance = _reach_distances(*self.adjacency(reverse), node)
+        found = np.flatnonzero(distance > 0)
+        found = found[np.argsort(distance[found], kind='stable')]
+        return found, distance[found]
+
+    def component_table(self):
+        components = self.components()
+        return pd.DataFrame({
+            'Submission_Number': self.node_ids,
+            'component': components.labels,
+            'component_size': components.sizes[components.labels],
         })
 
-    for _, row in df.iterrows():
-        pred = row['Predicate']
-        if pred and pred != "N/A" and pred in G.nodes and row['Submission_Number'] in G.nodes:
-            G.add_edge(pred, row['Submission_Number'])
-
-    pos = {}
-    for node in G.nodes:
-        node_row = df[df['Submission_Number'] == node]
-        if not node_row.empty:
-            fam = node_row['family'].iloc[0]
-            dt_val = node_row['Date'].iloc[0]
-            pos[node] = (fam, dt_val)
-
-    highlight_nodes = set()
-    if highlight_node and highlight_node in G:
-        highlight_nodes = get_subgraph_nodes_bfs(G, highlight_node)
-
-    # Color and symbol maps
-    predicate_location_color_map = {
-        'Specialty AI device': '#909090',
-        'Other AI device': '#7899B2',
-        'Non AI device': '#D96459',
-        'No predicate': '#78A085'
-    }
-    fda_symbol_map = {
-        '510(k)': 'circle',
-        'De Novo': 'triangle-up',
-        'Premarket': 'cross'
-    }
-
-    def dim_color(base_color, is_hl):
-        if not highlight_nodes:
-            return base_color
-        return base_color if is_hl else 'rgba(200,200,200,0.2)'
+    # Predicate-lineage metrics of the visible nodes, computed once per view
+    def lineage(self):
+        if self._lineage is None:
+            non_ai = self.index.predloc_codes[self.last_rows] == NON_AI_LOCATION_CODE
+            creep = pd.Series(self.column('Creep')).astype(str).str.strip().str.lower() == 'yes'
+            self._lineage = Lineage(len(self), self.edge_src, self.edge_dst, non_ai,
+                                    creep.to_numpy())
+        return self._lineage
+
+    # Lineage metrics of one visible submission number as a dict, or None
+    def lineage_of(self, submission_number):
+        node = self.local_index(submission_number)
+        if node < 0:
+            return None
+        lineage = self.lineage()
+        metrics = {col: getattr(lineage, col)[node].item() for col in LINEAGE_COLUMNS}
+        metrics['root'] = self.index.node_ids[self.node_codes[lineage.root[node]]]
+        for col in UNCOUNTED_COLUMNS:
+            if metrics[col] < 0:
+                metrics[col] = None
+        return metrics
+
+    # Lineage metrics of every visible node, one row each, ready to sort
+    def lineage_table(self):
+        lineage = self.lineage()
+        node_ids = np.asarray(self.node_ids, dtype=object)
+        table = pd.DataFrame({
+            'Submission_Number': node_ids,
+            'Device_Name': self.column('Device_Name'),
+        })
+        for col in LINEAGE_COLUMNS:
+            table[col] = getattr(lineage, col)
+        table['root'] = node_ids[lineage.root]
+        for col in UNCOUNTED_COLUMNS + ['creep_distance']:
+            table[col] = table[col].where(table[col] >= 0).astype('Int64')
+        return table
+
+
+def _scatter_class(n_points, webgl=None):
+    if webgl is None:
+        webgl = n_points > WEBGL_NODE_THRESHOLD
+    return go.Scattergl if webgl else go.Scatter
+
+
+# Full-detail traces: one marker per node in `nodes` (local indices of the view) and every
+# edge touching one of them, plus the per-color highlight overlays
+def _detail_traces(index, view, nodes, highlight_node=None, webgl=None):
+    scatter = _scatter_class(len(nodes), webgl)
+
+    # Component labels ship with the figure so the browser can highlight a network itself
+    component_index = view.components()
+    components = component_index.labels
+    highlighted = None
+    node = view.local_index(highlight_node) if highlight_node else -1
+    if node >= 0:
+        highlighted = np.zeros(len(view), dtype=bool)
+        highlighted[component_index.members(components[node])] = True
 
     # Build node trace
-    node_x, node_y = [], []
-    node_color, node_symbol, customdata = [], [], []
-
-    for node in G.nodes:
-        x, y = pos[node]
-        node_x.append(x)
-        node_y.append(y)
-        attr = G.nodes[node]
-        base_col = predicate_location_color_map.get(attr['predloc'], 'grey')
-        is_highlighted = node in highlight_nodes
-        final_col = dim_color(base_col, is_highlighted)
-
-        node_symbol.append(fda_symbol_map.get(attr['fda'], 'circle'))
-        node_color.append(final_col)
-
-        customdata.append([
-            node,
-            attr['device_name'],
-            attr['device_summary'],
-            attr['classification'],
-            attr['node_predicate'],
-            attr['date'].strftime('%Y-%m-%d') if pd.notna(attr['date']) else '',
-            attr['fda'],
-            attr['creep'],
-            attr['company'],
-            attr['leadspec'],
-            attr['secondspec'],
-            attr['shortdesc']
-        ])
+    node_x, _ = view.positions()
+    node_y = view.date_labels()
+    last_rows = view.last_rows[nodes]
+    node_color = np.array(NODE_COLORS, dtype=object)[index.predloc_codes[last_rows]]
+    node_symbol = np.array(NODE_SYMBOLS, dtype=object)[index.symbol_codes[last_rows]]
+
+    customdata = np.empty((len(nodes), len(HOVER_COLUMNS) + 1), dtype=object)
+    for i, col in enumerate(HOVER_COLUMNS):
+        customdata[:, i] = view.column(col)[nodes]
+    customdata[:, HOVER_COLUMNS.index('Date')] = np.where(
+        np.isnat(index.date[last_rows]), '', index.date_text[last_rows])
+    customdata[:, -1] = components[nodes]
 
     hovertemplate = (
         '<b>Submission Number:</b> %{customdata[0]}<br>'
         '<b>Device Name:</b> %{customdata[1]}<br>'
-        '<b>Date of Final Decision:</b> %{customdata[5]}<br>'
+        '<b>Date of Final Decision:</b> %{customdata[2]}<br>'
         '<b></br>'
         'Click for more information<extra></extra>'
     )
 
-    node_trace = go.Scatter(
-        x=node_x, y=node_y,
-        mode='markers+text',
-        textposition="middle right",
+    # Highlighting selects the network's nodes; everything else takes the unselected style
+    node_trace = scatter(
+        x=node_x[nodes], y=node_y[nodes],
+        mode='markers',
         hovertemplate=hovertemplate,
         customdata=customdata,
         marker=dict(
@@ -136,77 +723,226 @@ def build_figure(df, fda_filter='all', year_range=None, highlight_node=None):
             size=8,
             line=dict(width=1)
         ),
+        selectedpoints=np.flatnonzero(highlighted[nodes]) if highlighted is not None else None,
+        selected=dict(marker=dict(opacity=1)),
+        unselected=dict(marker=dict(color=NODE_DIM_COLOR, opacity=1)),
+        meta=dict(role=NODE_ROLE),
         showlegend=False
     )
 
-    # Build edge traces
-    edge_traces = []
-    for src, tgt in G.edges():
-        x0, y0 = pos[src]
-        x1, y1 = pos[tgt]
-        tgt_loc = G.nodes[tgt]['predloc']
-        base_edge_col = predicate_location_color_map.get(tgt_loc, 'black')
-
-        if highlight_nodes and (src not in highlight_nodes or tgt not in highlight_nodes):
-            edge_col = 'rgba(150,150,150,0.2)'
-        else:
-            edge_col = base_edge_col
-
-        edge_traces.append(
-            go.Scatter(
-                x=[x0, x1, None],
-                y=[y0, y1, None],
-                line=dict(width=2, color=edge_col),
-                hoverinfo='none',
-                mode='lines',
-                showlegend=False
-            )
+    # Build edge traces, grouping segments by the color of the target node.
+    # Every segment point carries its component label in customdata.
+    src, dst = view.edge_src, view.edge_dst
+    shown = np.zeros(len(view), dtype=bool)
+    shown[nodes] = True
+    edge_shown = shown[src] | shown[dst]
+    edge_color_codes = index.predloc_codes[view.last_rows][dst]
+    edge_color_codes[edge_color_codes < 0] = len(EDGE_COLORS) - 1
+    edge_components = components[src]
+
+    def edge_trace(group, color, meta):
+        n = int(group.sum())
+        return scatter(
+            x=np.column_stack([node_x[src[group]], node_x[dst[group]], np.full(n, np.nan)]).ravel(),
+            y=np.column_stack([node_y[src[group]], node_y[dst[group]], np.full(n, None)]).ravel(),
+            customdata=np.repeat(edge_components[group], 3),
+            line=dict(width=2, color=color),
+            hoverinfo='skip',
+            mode='lines',
+            meta=meta,
+            showlegend=False
         )
 
-    # Build legend traces for symbol and color explanations
-    legend_traces = [
-        # FDA pathways
-        go.Scatter(x=[None], y=[None], mode='markers', name='510(k)',
-                   marker=dict(symbol='circle', color='black', size=7), showlegend=True,
-                   legendgroup='FDA', legendgrouptitle=dict(text='Approval Pathway')),
-        go.Scatter(x=[None], y=[None], mode='markers', name='De Novo',
-                   marker=dict(symbol='triangle-up', color='black', size=7), showlegend=True,
-                   legendgroup='FDA'),
-        go.Scatter(x=[None], y=[None], mode='markers', name='Premarket',
-                   marker=dict(symbol='cross', color='black', size=7), showlegend=True,
-                   legendgroup='FDA'),
-        # Predicate types
-        go.Scatter(x=[None], y=[None], mode='markers', name='Specialty AI device',
-                   marker=dict(symbol='circle', color='#909090', size=7), showlegend=True,
-                   legendgroup='Location', legendgrouptitle=dict(text='Predicate Type')),
-        go.Scatter(x=[None], y=[None], mode='markers', name='Other AI device',
-                   marker=dict(symbol='circle', color='#7899B2', size=7), showlegend=True,
-                   legendgroup='Location'),
-        go.Scatter(x=[None], y=[None], mode='markers', name='Non AI device',
-                   marker=dict(symbol='circle', color='#D96459', size=7), showlegend=True,
-                   legendgroup='Location'),
-        go.Scatter(x=[None], y=[None], mode='markers', name='No predicate',
-                   marker=dict(symbol='circle', color='#78A085', size=7), showlegend=True,
-                   legendgroup='Location')
+    edge_traces, highlight_traces = [], []
+    for code, edge_col in enumerate(EDGE_COLORS):
+        group = (edge_color_codes == code) & edge_shown
+        hl_group = group & highlighted[src] if highlighted is not None else np.zeros_like(group)
+        edge_traces.append(edge_trace(
+            group, EDGE_DIM_COLOR if highlighted is not None else edge_col,
+            dict(role=EDGE_ROLE, color=edge_col, dim_color=EDGE_DIM_COLOR)))
+        highlight_traces.append(edge_trace(hl_group, edge_col, dict(role=EDGE_HIGHLIGHT_ROLE)))
+
+    return edge_traces + highlight_traces + [node_trace]
+
+
+# Level-of-detail traces: the nodes in `nodes` are binned on a grid of family columns and
+# time buckets sized to the window, each bin drawn as one marker (colored and shaped by its
+# most common predicate type and pathway, sized by its count) and the edges between
+# different bins merged into one segment per bin pair, keeping the LOD_MAX_EDGES busiest.
+# Highlighting a device selects every bin holding part of its network.
+def _aggregate_traces(index, view, nodes, highlight_node=None, webgl=None):
+    node_x, node_dates = view.positions()
+    x = node_x[nodes].astype(float)
+    t = node_dates[nodes]
+    placed = ~np.isnan(x) & ~np.isnat(t)
+    nodes, x, t = nodes[placed], x[placed], t[placed].astype(np.int64)
+    if not len(nodes):
+        return []
+
+    x0, t0 = x.min(), t.min()
+    x_width = max(1.0, np.ceil((x.max() - x0 + 1) / LOD_FAMILY_BINS))
+    t_width = max(DAY_NS, -(-(t.max() - t0 + 1) // LOD_TIME_BINS))
+    x_bin = ((x - x0) // x_width).astype(np.int64)
+    t_bin = (t - t0) // t_width
+    bins, node_bin = np.unique(x_bin * (t_bin.max() + 1) + t_bin, return_inverse=True)
+    n_bins = len(bins)
+    counts = np.bincount(node_bin, minlength=n_bins)
+
+    # Markers sit at the mean position of their members
+    bin_x = np.bincount(node_bin, weights=x, minlength=n_bins) / counts
+    bin_t = np.bincount(node_bin, weights=(t - t0).astype(float), minlength=n_bins) / counts
+    # Plotly reads numbers on a date axis as epoch milliseconds, which pack far smaller than strings
+    bin_y = (t0 + bin_t) / 1e6
+
+    def majority(codes, n_codes):
+        codes = np.where(codes < 0, n_codes - 1, codes)
+        table = np.bincount(node_bin * n_codes + codes, minlength=n_bins * n_codes)
+        return table.reshape(n_bins, n_codes).argmax(axis=1)
+
+    last_rows = view.last_rows[nodes]
+    bin_color = np.array(NODE_COLORS, dtype=object)[
+        majority(index.predloc_codes[last_rows], len(NODE_COLORS))]
+    bin_symbol = np.array(NODE_SYMBOLS, dtype=object)[
+        majority(index.symbol_codes[last_rows], len(NODE_SYMBOLS))]
+
+    order = np.argsort(node_bin, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    x_lo, x_hi = np.minimum.reduceat(x[order], starts), np.maximum.reduceat(x[order], starts)
+    t_lo = _date_strings(np.minimum.reduceat(t[order], starts).astype('datetime64[ns]'))
+    t_hi = _date_strings(np.maximum.reduceat(t[order], starts).astype('datetime64[ns]'))
+    highlighted = np.zeros(n_bins, dtype=np.int64)
+    node = view.local_index(highlight_node) if highlight_node else -1
+    if node >= 0:
+        component_index = view.components()
+        in_network = np.zeros(len(view), dtype=bool)
+        in_network[component_index.members(component_index.labels[node])] = True
+        highlighted = np.bincount(node_bin[in_network[nodes]], minlength=n_bins)
+    hovertext = [
+        f"<b>{count} devices</b><br>Families: {lo:g}" + (f"–{hi:g}" if hi != lo else '')
+        + f"<br>Dates: {first[:10]} to {last[:10]}"
+        + (f"<br>{k} in the highlighted network" if k else '') + "<br><br>Zoom in for details"
+        for count, lo, hi, first, last, k in zip(counts, x_lo, x_hi, t_lo, t_hi, highlighted)
     ]
 
-    # Assemble figure
-    fig = go.Figure(
-        data=edge_traces + [node_trace] + legend_traces,
-        layout=go.Layout(
-            title='',
-            showlegend=True,
-            hovermode='closest',
-            margin=dict(b=0, l=0, r=0, t=0),
-            xaxis=dict(title='', showticklabels=False, showgrid=False, zeroline=False),
-            yaxis=dict(title='Date of Approval', showgrid=True, zeroline=False, tickformat='%Y'),
-            plot_bgcolor='rgb(230,230,230)',
-            paper_bgcolor='rgb(230,230,230)'
-        )
+    scatter = _scatter_class(n_bins, webgl)
+    node_trace = scatter(
+        x=bin_x, y=bin_y,
+        mode='markers',
+        hovertemplate='%{text}<extra></extra>',
+        text=hovertext,
+        marker=dict(
+            color=bin_color,
+            symbol=bin_symbol,
+            size=np.minimum(6 + 3 * np.log2(counts), 30),
+            line=dict(width=1)
+        ),
+        selectedpoints=np.flatnonzero(highlighted) if node >= 0 else None,
+        selected=dict(marker=dict(opacity=1)),
+        unselected=dict(marker=dict(color=NODE_DIM_COLOR, opacity=1)),
+        meta=dict(role=AGGREGATE_NODE_ROLE),
+        showlegend=False
     )
 
-    fig.update_layout(
-        legend=dict(x=1.02, y=0.5, xanchor='left', yanchor='middle')
+    bin_of = np.full(len(view), -1, dtype=np.int64)
+    bin_of[nodes] = node_bin
+    src, dst = bin_of[view.edge_src], bin_of[view.edge_dst]
+    keep = (src >= 0) & (dst >= 0) & (src != dst)
+    pairs, pair_counts = np.unique(src[keep] * n_bins + dst[keep], return_counts=True)
+    if len(pairs) > LOD_MAX_EDGES:
+        pairs = np.sort(pairs[np.argsort(-pair_counts, kind='stable')[:LOD_MAX_EDGES]])
+    src, dst = pairs // n_bins, pairs % n_bins
+    n = len(pairs)
+    edge_trace = scatter(
+        x=np.column_stack([bin_x[src], bin_x[dst], np.full(n, np.nan)]).ravel(),
+        y=np.column_stack([bin_y[src], bin_y[dst], np.full(n, np.nan)]).ravel(),
+        line=dict(width=1, color=AGGREGATE_EDGE_COLOR),
+        hoverinfo='skip',
+        mode='lines',
+        meta=dict(role=AGGREGATE_EDGE_ROLE),
+        showlegend=False
     )
 
+    return [edge_trace, node_trace]
+
+
+# Build the Plotly figure from a sheet's GraphIndex (or a cleaned DataFrame),
+# filtered by FDA pathway and year and optionally highlighting one device's network.
+# x_range/y_range restrict the figure to the plotted window (y as dates); lod=None
+# aggregates when more than LOD_NODE_THRESHOLD nodes fall in that window, and
+# webgl=None picks Scattergl traces above WEBGL_NODE_THRESHOLD points.
+@timer('build_figure')
+def build_figure(sheet, fda_filter='all', year_range=None, highlight_node=None, webgl=None,
+                 x_range=None, y_range=None, lod=None):
+    # Phases are timed separately (see metrics.py): filtering rows into a graph view,
+    # connected components, trace construction and go.Figure assembly
+    with timed('build_figure.filter'):
+        index = sheet if isinstance(sheet, GraphIndex) else GraphIndex(sheet)
+        view = index.select(fda_filter, year_range)
+        nodes = np.flatnonzero(view.window_mask(x_range, y_range))
+    if lod is None:
+        lod = len(nodes) > LOD_NODE_THRESHOLD
+
+    if lod:
+        with timed('build_figure.traces'):
+            traces = _aggregate_traces(index, view, nodes, highlight_node, webgl)
+    else:
+        with timed('build_figure.components'):
+            view.components()
+        with timed('build_figure.traces'):
+            traces = _detail_traces(index, view, nodes, highlight_node, webgl)
+
+    with timed('build_figure.assemble'):
+        # Build legend traces for symbol and color explanations
+        legend_traces = [
+            # FDA pathways
+            go.Scatter(x=[None], y=[None], mode='markers', name='510(k)',
+                       marker=dict(symbol='circle', color='black', size=7), showlegend=True,
+                       legendgroup='FDA', legendgrouptitle=dict(text='Approval Pathway')),
+            go.Scatter(x=[None], y=[None], mode='markers', name='De Novo',
+                       marker=dict(symbol='triangle-up', color='black', size=7), showlegend=True,
+                       legendgroup='FDA'),
+            go.Scatter(x=[None], y=[None], mode='markers', name='Premarket',
+                       marker=dict(symbol='cross', color='black', size=7), showlegend=True,
+                       legendgroup='FDA'),
+            # Predicate types
+            go.Scatter(x=[None], y=[None], mode='markers', name='Specialty AI device',
+                       marker=dict(symbol='circle', color='#909090', size=7), showlegend=True,
+                       legendgroup='Location', legendgrouptitle=dict(text='Predicate Type')),
+            go.Scatter(x=[None], y=[None], mode='markers', name='Other AI device',
+                       marker=dict(symbol='circle', color='#7899B2', size=7), showlegend=True,
+                       legendgroup='Location'),
+            go.Scatter(x=[None], y=[None], mode='markers', name='Non AI device',
+                       marker=dict(symbol='circle', color='#D96459', size=7), showlegend=True,
+                       legendgroup='Location'),
+            go.Scatter(x=[None], y=[None], mode='markers', name='No predicate',
+                       marker=dict(symbol='circle', color='#78A085', size=7), showlegend=True,
+                       legendgroup='Location')
+        ]
+
+        # Assemble figure
+        fig = go.Figure(
+            data=traces + legend_traces,
+            layout=go.Layout(
+                title='',
+                showlegend=True,
+                hovermode='closest',
+                margin=dict(b=0, l=0, r=0, t=0),
+                xaxis=dict(title='', showticklabels=False, showgrid=False, zeroline=False),
+                yaxis=dict(title='Date of Approval', type='date', showgrid=True, zeroline=False,
+                           tickformat='%Y'),
+                plot_bgcolor='rgb(230,230,230)',
+                paper_bgcolor='rgb(230,230,230)'
+            )
+        )
+
+        fig.update_layout(
+            legend=dict(x=1.02, y=0.5, xanchor='left', yanchor='middle')
+        )
+
+        # A windowed figure keeps the zoom it was built for
+        if x_range is not None:
+            fig.update_xaxes(range=list(x_range))
+        if y_range is not None:
+            fig.update_yaxes(range=list(y_range))
+
     return fig
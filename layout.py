@@ -1,16 +1,10 @@
 # Defines the layout of the Dash app, including navbar, filters, graph, and explanatory content
 
-from dash import html, dcc
+from dash import html, dcc, dash_table
 import dash_bootstrap_components as dbc
-from data import all_sheets, min_year, max_year
-from graph_utils import build_figure
-
-# Get options for specialty dropdown
-specialty_options = [{'label': name, 'value': name} for name in all_sheets.keys()]
-specialty_default = list(all_sheets.keys())[0]
-
-# Initial figure to load
-initial_fig = build_figure(all_sheets[specialty_default])
+from data import ALL_SPECIALTIES, get_store
+from figure_cache import cached_figure, figure_key
+from graph_utils import FDA_PATHWAYS
 
 # Navbar at the top of the app
 navbar = dbc.Navbar(
@@ -32,7 +26,32 @@ info_offcanvas = dbc.Offcanvas(
     scrollable=True
 )
 
+# Columns of the sortable predicate-lineage table below the graph
+lineage_columns = [
+    {'name': 'Submission Number', 'id': 'Submission_Number'},
+    {'name': 'Device Name', 'id': 'Device_Name'},
+    {'name': 'Chain Depth', 'id': 'depth'},
+    {'name': 'Distance to Root', 'id': 'root_distance'},
+    {'name': 'Root Device', 'id': 'root'},
+    {'name': 'Ancestors', 'id': 'ancestors'},
+    {'name': 'Descendants', 'id': 'descendants'},
+    {'name': 'Non-AI Ancestor', 'id': 'non_ai_ancestor'},
+    {'name': 'Generations to Creep Risk', 'id': 'creep_distance'},
+]
+
+# Called on every page load, so a reloaded workbook's sheets and years show up in the filters
 def create_layout(app):
+    store = get_store()
+    min_year, max_year = store.min_year, store.max_year
+
+    # Get options for specialty dropdown
+    specialty_options = [{'label': 'All specialties', 'value': ALL_SPECIALTIES}] + \
+        [{'label': name, 'value': name} for name in store.sheet_names]
+    specialty_default = store.sheet_names[0]
+
+    # Initial figure to load
+    initial_fig = cached_figure(store, specialty_default)
+
     return dbc.Container(fluid=True, children=[
         navbar,
 
@@ -53,12 +72,8 @@ def create_layout(app):
                 html.Label("Filter by FDA Pathway:", className="fw-bold"),
                 dcc.Dropdown(
                     id='fda_filter',
-                    options=[
-                        {'label': 'All', 'value': 'all'},
-                        {'label': '510(k)', 'value': '510(k)'},
-                        {'label': 'De Novo', 'value': 'De Novo'},
-                        {'label': 'Premarket', 'value': 'Premarket'}
-                    ],
+                    options=[{'label': 'All' if pathway == 'all' else pathway, 'value': pathway}
+                             for pathway in FDA_PATHWAYS],
                     value='all',
                     clearable=False,
                     style={"backgroundColor": "white", "color": "black"}
@@ -74,7 +89,9 @@ def create_layout(app):
                     value=[min_year, max_year],
                     marks={y: str(y) for y in range(min_year, max_year+1, 2)},
                     step=1,
-                    allowCross=False
+                    allowCross=False,
+                    # Redraw once the handle is released rather than on every step of a drag
+                    updatemode='mouseup'
                 )
             ], width=6),
         ], className="mb-3"),
@@ -86,11 +103,15 @@ def create_layout(app):
                     dcc.Input(
                         id='device-search',
                         type='text',
-                        placeholder='Search device ID, e.g. K123456',
+                        placeholder='Search device ID, name or company, e.g. K123456',
                         className="me-2",
                         style={"width": "25%"},
+                        list='device-suggestions',
+                        autoComplete='off',
                         n_submit=0
                     ),
+                    html.Datalist(id='device-suggestions'),
+                    dcc.Store(id='search-target'),
                     html.Button(
                         'Search',
                         id='search-button',
@@ -115,10 +136,38 @@ def create_layout(app):
                     id='predicate-network-graph',
                     figure=initial_fig,
                     style={"height": "70vh"}
-                )
+                ),
+                # Figure build requested from a background callback (see callbacks.update_figure)
+                dcc.Store(id='figure-job'),
+                # Cache key of the figure shown, which later updates are sent as patches against
+                dcc.Store(id='figure-key', data=figure_key(store, specialty_default)),
+                # Aggregated figure to rebuild with the search target highlighted (see assets/highlight.js)
+                dcc.Store(id='highlight-request'),
+                # Lineage table build requested from a background callback
+                dcc.Store(id='lineage-job')
             ], width=12)
         ]),
 
+        # Predicate lineage table row (paged and sorted server-side)
+        dbc.Row([
+            dbc.Col([
+                html.H5("Predicate Lineage", className="fw-bold mt-4"),
+                dash_table.DataTable(
+                    id='lineage-table',
+                    columns=lineage_columns,
+                    page_action='custom',
+                    page_current=0,
+                    page_size=15,
+                    sort_action='custom',
+                    sort_mode='single',
+                    sort_by=[{'column_id': 'depth', 'direction': 'desc'}],
+                    style_table={"overflowX": "auto"},
+                    style_cell={"textAlign": "left", "fontSize": "0.9rem"},
+                    style_header={"fontWeight": "bold"}
+                )
+            ], id='lineage-panel', width=12)
+        ]),
+
         # Offcanvas info panel
         info_offcanvas,
 
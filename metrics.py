@@ -0,0 +1,195 @@
+# Latency instrumentation: named timers with count and p50/p95/p99 summaries, served as JSON
+# at /metrics, plus opt-in cProfile capture of single requests at /metrics/profile.
+#
+#   PREDICATE_METRICS=0     turn timing off (timers become no-ops)
+#   PREDICATE_PROFILING=1   enable profiling; a request is profiled when it carries an
+#                           X-Profile header or ?profile=1, or when POST /metrics/profile
+#                           has armed the next Dash callback request
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+from flask import g, jsonify, request
+
+ENABLED = os.environ.get('PREDICATE_METRICS', '1') != '0'
+PROFILING = os.environ.get('PREDICATE_PROFILING', '0') == '1'
+
+# Percentiles are taken over the latest WINDOW samples of each timer; counts and totals
+# cover the whole process lifetime
+WINDOW = 2048
+
+# Profiles kept for /metrics/profile, newest last, and the rows shown for each
+MAX_PROFILES = 8
+PROFILE_ROWS = 40
+
+DASH_UPDATE_PATH = '/_dash-update-component'
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=WINDOW)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self):
+        p50, p95, p99 = np.percentile(np.fromiter(self.samples, float), [50, 95, 99]) * 1000
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3),
+            'p50_ms': round(p50, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def record(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.record(seconds)
+
+
+# Time the enclosed block under name
+@contextmanager
+def timed(name):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+# Decorator timing every call of a function under name
+def timer(name):
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+# Summary of every timer, by name
+def snapshot():
+    with _lock:
+        return {name: histogram.summary() for name, histogram in sorted(_histograms.items())}
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+_profiles = deque(maxlen=MAX_PROFILES)
+_profile_lock = threading.Lock()
+_arm_lock = threading.Lock()
+_armed = 0
+
+
+def _wants_profile():
+    global _armed
+    if request.headers.get('X-Profile') or request.args.get('profile'):
+        return True
+    if request.path == DASH_UPDATE_PATH:
+        with _arm_lock:
+            if _armed:
+                _armed -= 1
+                return True
+    return False
+
+
+def _profile_report(profiler, label, seconds):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_ROWS)
+    return {'request': label, 'ms': round(seconds * 1000, 3), 'stats': out.getvalue()}
+
+
+# Add the /metrics routes and request hooks to a Flask server (app.server). `extra` maps
+# names to functions returning more JSON-ready stats, e.g. the figure cache's.
+def register(server, **extra):
+    @server.route('/metrics')
+    def metrics_route():
+        return jsonify({
+            'enabled': ENABLED,
+            'timers': snapshot(),
+            **{name: stats() for name, stats in extra.items()},
+        })
+
+    if ENABLED:
+        # Whole-request latency of Dash callbacks, including JSON serialization of the response
+        @server.before_request
+        def start_request_timer():
+            if request.path == DASH_UPDATE_PATH:
+                g.metrics_start = time.perf_counter()
+
+        @server.after_request
+        def stop_request_timer(response):
+            start = g.pop('metrics_start', None)
+            if start is not None:
+                record('request.dash_update', time.perf_counter() - start)
+            return response
+
+    if not PROFILING:
+        return
+
+    # cProfile hooks only exist when profiling is enabled. One request is profiled at a time.
+    @server.before_request
+    def start_profile():
+        if _wants_profile() and _profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profile_start = time.perf_counter()
+            g.profiler.enable()
+
+    @server.teardown_request
+    def stop_profile(exc):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        seconds = time.perf_counter() - g.pop('profile_start')
+        _profile_lock.release()
+        label = f'{request.method} {request.full_path.rstrip("?")}'
+        _profiles.append(_profile_report(profiler, label, seconds))
+
+    # GET: the latest profiles as text. POST ?count=N: profile the next N Dash callback requests.
+    @server.route('/metrics/profile', methods=['GET', 'POST'])
+    def profile_route():
+        global _armed
+        if request.method == 'POST':
+            with _arm_lock:
+                _armed = max(1, request.args.get('count', 1, type=int))
+            return jsonify({'armed': _armed})
+        reports = [f"=== {p['request']} ({p['ms']} ms) ===\n{p['stats']}" for p in reversed(_profiles)]
+        body = '\n'.join(reports) or 'No profiles captured yet.\n'
+        return body, 200, {'Content-Type': 'text/plain; charset=utf-8'}
@@ -0,0 +1,175 @@
+# Device search over every sheet: prefix and typo-tolerant matching on submission number,
+# device name and company, used for the search box's autocomplete and to find which
+# specialty a device lives in
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Fields a term can come from, best first when ranking equally close matches
+FIELDS = ['Submission_Number', 'Device_Name', 'Company']
+
+# Words checked for edit distance per query word, taken by shared trigrams
+FUZZY_CANDIDATES = 40
+
+
+def normalize(text):
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', str(text).lower()).split())
+
+
+def _trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Levenshtein distance between a and b, or limit + 1 once it is known to exceed limit
+def edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+# Built once per data snapshot from the merged GraphIndex. Every device contributes its
+# normalized submission number, full name and company, and each word of the name and company,
+# as terms. Terms are kept in one sorted array, so a prefix is a binary search, and each
+# distinct word is listed under its trigrams to find close spellings.
+class SearchIndex:
+    def __init__(self, index):
+        n_nodes = len(index.node_ids)
+        # Rows without a submission number (row_node -1) aren't devices
+        rows = np.flatnonzero(index.row_node >= 0)
+        row_node = index.row_node[rows]
+        last_rows = np.empty(n_nodes, dtype=np.int64)
+        last_rows[row_node] = rows
+        self.node_ids = np.asarray(index.node_ids, dtype=object)
+        self.names = index.columns['Device_Name'][last_rows]
+        self.companies = index.columns['Company'][last_rows]
+
+        # Sheets listing each device, in workbook order
+        pairs = np.unique(np.stack([row_node, index.row_sheet[rows]]), axis=1)
+        self.sheet_names = index.sheet_names
+        self.node_sheets = np.split(pairs[1], np.flatnonzero(np.diff(pairs[0])) + 1)
+
+        text = pd.Series(np.concatenate([self.node_ids, self.names, self.companies])).astype(str)
+        text = text.str.lower().str.replace(r'[^0-9a-z]+', ' ', regex=True).str.strip()
+        field = np.repeat(np.arange(len(FIELDS), dtype=np.int8), n_nodes)
+        node = np.tile(np.arange(n_nodes), len(FIELDS))
+        words = text[field > 0].str.split().explode().dropna()
+        entries = pd.concat([
+            pd.DataFrame({'term': text, 'node': node, 'field': field}),
+            pd.DataFrame({'term': words.to_numpy(), 'node': node[words.index], 'field': field[words.index]}),
+        ])
+        entries = entries[entries['term'] != ''].drop_duplicates().sort_values('term', kind='stable')
+        self.terms = entries['term'].to_numpy(dtype=str)
+        self.term_nodes = entries['node'].to_numpy()
+        self.term_fields = entries['field'].to_numpy()
+        self.term_lengths = np.char.str_len(self.terms)
+
+        # Distinct single words, where each one's entries sit in self.terms, and their trigrams
+        vocab = pd.Series(self.terms)
+        vocab = vocab[~vocab.duplicated() & ~vocab.str.contains(' ', regex=False)]
+        self.vocab = vocab.to_numpy(dtype=object)
+        self.vocab_starts = vocab.index.to_numpy()
+        self.vocab_ends = np.searchsorted(self.terms, self.terms[self.vocab_starts], side='right')
+        grams = pd.Series([sorted(_trigrams(word)) for word in self.vocab]).explode()
+        gram_keys, gram_codes = pd.factorize(grams)
+        order = np.argsort(gram_keys, kind='stable')
+        self.gram_codes = pd.Index(gram_codes)
+        self.gram_offsets = np.searchsorted(gram_keys[order], np.arange(len(gram_codes) + 1))
+        self.gram_vocab = grams.index.to_numpy()[order]
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    # Entry positions (into self.terms) of every term starting with prefix
+    def _prefix_entries(self, prefix):
+        lo = np.searchsorted(self.terms, prefix, side='left')
+        hi = np.searchsorted(self.terms, prefix + '\uffff', side='left')
+        return np.arange(lo, hi)
+
+    # Entry positions and edit distances of words within max_edits of word (or of a prefix)
+    def _fuzzy_entries(self, word, max_edits):
+        none = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        codes = self.gram_codes.get_indexer(sorted(_trigrams(word)))
+        codes = codes[codes >= 0]
+        if not max_edits or not len(codes):
+            return none
+        postings = np.concatenate([self.gram_vocab[self.gram_offsets[c]:self.gram_offsets[c + 1]]
+                                   for c in codes])
+        counts = np.bincount(postings)
+        top = np.flatnonzero(counts)
+        top = top[np.argsort(-counts[top], kind='stable')[:FUZZY_CANDIDATES]]
+
+        entries, edits = [], []
+        for vocab_id in top.tolist():
+            term = self.vocab[vocab_id]
+            distance = min(edit_distance(word, term[:len(word) + k], max_edits) for k in (-1, 0, 1))
+            if 0 < distance <= max_edits:
+                span = np.arange(self.vocab_starts[vocab_id], self.vocab_ends[vocab_id])
+                entries.append(span)
+                edits.append(np.full(len(span), distance))
+        if not entries:
+            return none
+        return np.concatenate(entries), np.concatenate(edits)
+
+    # Best rank per node over the given entries, ranks being (edits, field, inexact, length)
+    # with lower first; only the top `limit` nodes are kept
+    def _rank(self, entries, edits, query, limit):
+        keys = (self.term_lengths[entries], self.terms[entries] != query,
+                self.term_fields[entries], edits)
+        order = np.lexsort(keys)
+        nodes, first = np.unique(self.term_nodes[entries][order], return_index=True)
+        first = np.sort(first)[:limit]
+        ranked = order[first]
+        return {node: rank for node, rank in zip(
+            self.term_nodes[entries][ranked].tolist(),
+            zip(*(key[ranked].tolist() for key in reversed(keys))))}
+
+    # Best matching devices for a free-text query, best first, as dicts with the submission
+    # number, name, company, the field that matched, its edit distance and the sheets listing it
+    def search(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+
+        entries = self._prefix_entries(query)
+        best = self._rank(entries, np.zeros(len(entries), dtype=np.int64), query, limit)
+
+        # Typos: single-word queries look the word up directly; longer ones need every word
+        # to start a term of the device or be a close spelling of one
+        words = query.split()
+        max_edits = [0 if len(word) < 3 else 1 if len(word) <= 6 else 2 for word in words]
+        if len(best) < limit and len(words) == 1:
+            entries, edits = self._fuzzy_entries(query, max_edits[0])
+            for node, rank in self._rank(entries, edits, query, limit).items():
+                best.setdefault(node, rank)
+        elif len(best) < limit:
+            node_edits = None
+            for word, allowed in zip(words, max_edits):
+                prefix = self._prefix_entries(word)
+                fuzzy, edits = self._fuzzy_entries(word, allowed)
+                matched = pd.Series(np.concatenate([np.zeros(len(prefix), dtype=np.int64), edits]),
+                                    index=self.term_nodes[np.concatenate([prefix, fuzzy])])
+                matched = matched.groupby(level=0).min()
+                node_edits = matched if node_edits is None else node_edits.add(matched).dropna()
+            for node, edits in node_edits.sort_values(kind='stable').head(limit).items():
+                best.setdefault(node, (int(edits), len(FIELDS), True, 0))
+
+        hits = sorted(best, key=lambda node: (best[node], node))[:limit]
+        return [{
+            'Submission_Number': self.node_ids[node],
+            'Device_Name': self.names[node],
+            'Company': self.companies[node],
+            'match': FIELDS[best[node][1]] if best[node][1] < len(FIELDS) else 'words',
+            'edits': best[node][0],
+            'sheets': [self.sheet_names[s] for s in self.node_sheets[node]],
+        } for node in hits]
@@ -0,0 +1,145 @@
+# Shared, memory-mapped copy of the merged graph index for multi-process deployments
+# (e.g. gunicorn with several workers). The merged GraphIndex is written once into a directory
+# of .npy files next to the sheet cache; workers memory-map it read-only, so every worker
+# shares one copy of the data in the page cache instead of parsing the workbook and holding
+# its own DataFrames. Text columns are stored as one UTF-8 buffer per column.
+#
+# Enable with PREDICATE_SHARED_STORE=1, and build the store before starting the workers:
+#
+#   PREDICATE_SHARED_STORE=1 python shared_store.py
+#   PREDICATE_SHARED_STORE=1 gunicorn -w 4 app:server
+#
+# A worker that finds no store for the current workbook builds and writes it itself.
+
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from graph_utils import DETAIL_COLUMNS, GraphIndex
+
+STORE_PREFIX = 'shared_'
+# Bump whenever GraphIndex computes its row arrays differently, so stale stores are rebuilt
+STORE_FORMAT = 2
+
+# Separates strings in a text column's buffer; Excel cells can't contain it
+_SEPARATOR = '\x00'
+
+
+# Read-only text column over a UTF-8 buffer, each string followed by a separator, and the
+# offset of every string in it. Indexing with an array decodes just the selected strings.
+# Empty strings read back as `empty` (e.g. None for the missing dates of date_text).
+class StringColumn:
+    def __init__(self, offsets, buffer, empty=''):
+        self.offsets = offsets
+        self.buffer = buffer
+        self.empty = empty
+
+    @classmethod
+    def encode(cls, values):
+        encoded = [('' if v is None or v is pd.NaT or (isinstance(v, float) and np.isnan(v))
+                    else str(v)).encode() + b'\x00' for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            start, stop = self.offsets[key], self.offsets[key + 1] - 1
+            return self.buffer[start:stop].tobytes().decode() if stop > start else self.empty
+        rows = np.arange(len(self))[key]
+        starts = self.offsets[rows]
+        lengths = self.offsets[rows + 1] - starts
+        shift = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        text = self.buffer[shift + np.arange(lengths.sum())].tobytes().decode()
+        out = np.empty(len(rows), dtype=object)
+        out[:] = text.split(_SEPARATOR)[:-1]
+        if self.empty != '':
+            out[lengths == 1] = self.empty
+        return out
+
+
+# The Date detail column, as Timestamps (NaT when missing), over the index's datetime64 array
+class DateColumn:
+    def __init__(self, dates):
+        self.dates = dates
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return pd.Timestamp(self.dates[key])
+        return pd.Series(self.dates[key]).to_numpy(dtype=object)
+
+
+def _save_text(directory, name, values):
+    column = StringColumn.encode(values)
+    np.save(os.path.join(directory, f'{name}.offsets.npy'), column.offsets)
+    np.save(os.path.join(directory, f'{name}.text.npy'), column.buffer)
+
+
+def _load_text(directory, name, empty=''):
+    return StringColumn(np.load(os.path.join(directory, f'{name}.offsets.npy'), mmap_mode='r'),
+                        np.load(os.path.join(directory, f'{name}.text.npy'), mmap_mode='r'), empty)
+
+
+def save_index(index, directory):
+    os.makedirs(directory)
+    for name in GraphIndex.ROW_ARRAYS:
+        np.save(os.path.join(directory, f'{name}.npy'), getattr(index, name))
+    _save_text(directory, 'node_ids', index.node_ids)
+    _save_text(directory, 'date_text', index.date_text)
+    for col in DETAIL_COLUMNS:
+        if col != 'Date':
+            _save_text(directory, f'column.{col}', index.columns[col])
+    with open(os.path.join(directory, 'meta.pkl'), 'wb') as f:
+        pickle.dump({'sheet_names': index.sheet_names, 'fda_values': index.fda_values}, f)
+
+
+# Attach to a saved index. Row arrays and text columns stay memory-mapped; only the
+# submission numbers (which every lookup hashes) are decoded into this process.
+def load_index(directory):
+    with open(os.path.join(directory, 'meta.pkl'), 'rb') as f:
+        meta = pickle.load(f)
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+              for name in GraphIndex.ROW_ARRAYS}
+    columns = {col: DateColumn(arrays['date']) if col == 'Date' else _load_text(directory, f'column.{col}')
+               for col in DETAIL_COLUMNS}
+    node_ids = _load_text(directory, 'node_ids')[:]
+    return GraphIndex.from_arrays(arrays, node_ids, _load_text(directory, 'date_text', None), columns,
+                                  meta['fda_values'], meta['sheet_names'])
+
+
+# The merged index saved under cache_dir for workbook content `version`, written first with
+# build() if no process has yet. Stores of other versions are removed once a new one is written.
+def attach(cache_dir, version, build):
+    directory = os.path.join(cache_dir, f'{STORE_PREFIX}{STORE_FORMAT}_{version}')
+    if not os.path.isdir(directory):
+        tmp = f'{directory}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        save_index(build(), tmp)
+        try:
+            os.rename(tmp, directory)
+        except OSError:
+            # Another worker got there first; use its copy
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            for name in os.listdir(cache_dir):
+                path = os.path.join(cache_dir, name)
+                if name.startswith(STORE_PREFIX) and not name.endswith('.tmp') and path != directory:
+                    shutil.rmtree(path, ignore_errors=True)
+    return load_index(directory)
+
+
+if __name__ == "__main__":
+    import data
+    store = data.DataStore(shared=True)
+    index = store.merged_index()
+    print(f"Shared store for {store.workbook_path}: {len(index)} devices in {index.n_rows} rows "
+          f"({', '.join(store.sheet_names)})")
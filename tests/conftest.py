@@ -0,0 +1,8 @@
+# Settings read when the app's modules are imported, so they are set before any test module
+# imports them: a low level-of-detail threshold so the synthetic workbook's first page is
+# aggregated, figures built inside the request, and no background reloader.
+
+import os
+
+os.environ.update(PREDICATE_LOD_THRESHOLD='3000', PREDICATE_BACKGROUND='0',
+                  PREDICATE_RELOAD_INTERVAL='0')
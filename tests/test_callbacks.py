@@ -0,0 +1,168 @@
+# Callback round trips through the Dash endpoint, on a synthetic workbook large enough for the
+# first page to show an aggregated (level-of-detail) figure.
+#
+#   python -m pytest tests
+
+import base64
+import os
+import sys
+
+import numpy as np
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+
+from synthetic import specialty_sizes, write_workbook
+
+GRAPH = 'predicate-network-graph'
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('workbook')
+    write_workbook(str(workdir / 'predicate_data_main.xlsx'), specialty_sizes(8000))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from app import app
+        yield app.server.test_client()
+    finally:
+        os.chdir(cwd)
+
+
+def _component(layout, component_id):
+    if isinstance(layout, dict):
+        if layout.get('props', {}).get('id') == component_id:
+            return layout['props']
+        children = layout.get('props', {}).get('children')
+        return _component(children, component_id) if children is not None else None
+    if isinstance(layout, list):
+        for child in layout:
+            found = _component(child, component_id)
+            if found is not None:
+                return found
+    return None
+
+
+# Run update_figure for one relayout event while the browser shows the figure of shown_key
+def _relayout(client, specialty, relayout, shown_key):
+    dependencies = client.get('/_dash-dependencies').get_json()
+    callback = next(c for c in dependencies if 'figure-job.data' in c['output']
+                    and any(i['property'] == 'relayoutData' for i in c['inputs']))
+    outputs = [dict(zip(['id', 'property'], o.split('.'))) for o in callback['output'].strip('.').split('...')]
+    inputs = {'specialty-dropdown': specialty, 'fda_filter': 'all', 'year_slider': None,
+              GRAPH: relayout, 'highlight-request': None}
+    payload = {
+        'output': callback['output'],
+        'outputs': outputs,
+        'inputs': [dict(i, value=inputs[i['id']]) for i in callback['inputs']],
+        'state': [dict(s, value=shown_key if s['id'] == 'figure-key' else None) for s in callback['state']],
+        'changedPropIds': [f'{GRAPH}.relayoutData'],
+    }
+    response = client.post('/_dash-update-component', json=payload)
+    assert response.status_code == 200, response.data[:500]
+    return response.get_json()['response']
+
+
+def test_zoom_into_aggregated_view_with_cached_figure_shown(client):
+    import data
+    layout = client.get('/_dash-layout').get_json()
+    shown_key = _component(layout, 'figure-key')['data']
+    figure = _component(layout, GRAPH)['figure']
+    assert any(trace['meta']['role'] == 'aggregate-nodes' for trace in figure['data'])
+
+    specialty = data.get_store().sheet_names[0]
+    zoom = {'xaxis.range[0]': 0, 'xaxis.range[1]': 20}
+    response = _relayout(client, specialty, zoom, shown_key)
+    window_key = response['figure-key']['data']
+    assert window_key[:5] == shown_key and window_key[5] == [[0, 20], None]
+    assert GRAPH in response
+
+    # Zooming again from the window (which isn't cached) sends the whole figure
+    zoom = {'xaxis.range[0]': 5, 'xaxis.range[1]': 10}
+    response = _relayout(client, specialty, zoom, window_key)
+    assert 'data' in response[GRAPH]['figure']
+    assert response['figure-key']['data'][5] == [[5, 10], None]
+
+
+# Run a callback found by one of its outputs with the given input and state values
+def _call(client, output, values, changed):
+    dependencies = client.get('/_dash-dependencies').get_json()
+    callback = next(c for c in dependencies if c['output'].startswith(f'..{output}...')
+                    or c['output'] == output)
+    outputs = [dict(zip(['id', 'property'], o.split('.'))) for o in callback['output'].strip('.').split('...')]
+    payload = {
+        'output': callback['output'],
+        'outputs': outputs,
+        'inputs': [dict(i, value=values.get(f"{i['id']}.{i['property']}")) for i in callback['inputs']],
+        'state': [dict(s, value=values.get(f"{s['id']}.{s['property']}")) for s in callback['state']],
+        'changedPropIds': changed,
+    }
+    response = client.post('/_dash-update-component', json=payload)
+    # Dash answers 204 when every output is no_update
+    if response.status_code == 204:
+        return {}
+    assert response.status_code == 200, response.data[:500]
+    return response.get_json()['response']
+
+
+def test_lineage_table_pages_and_device_panel(client):
+    import background
+    import data
+    store = data.get_store()
+    specialty = store.sheet_names[0]
+    values = {'specialty-dropdown.value': specialty, 'fda_filter.value': 'all',
+              'year_slider.value': None, 'lineage-table.page_current': 2,
+              'lineage-table.page_size': 10,
+              'lineage-table.sort_by': [{'column_id': 'depth', 'direction': 'desc'}]}
+    response = _call(client, 'lineage-table.data', values, ['lineage-table.page_current'])
+    rows = response['lineage-table']['data']
+    assert len(rows) == 10 and response['lineage-table']['page_current'] == 2
+    assert background.lookup_lineage(store, specialty) is not None
+
+    # The device panel reads lineage metrics from the table just built
+    device = rows[0]['Submission_Number']
+    values.update({'predicate-network-graph.clickData': {'points': [{'customdata': [device]}]},
+                   'specialty-dropdown.value': specialty})
+    response = _call(client, 'info-offcanvas.is_open', values, ['predicate-network-graph.clickData'])
+    panel = str(response['info-content']['children'])
+    assert f"Predicate Chain Depth: {rows[0]['depth']}" in panel
+    expected = store.graph_index(specialty).lineage(device)
+    assert f"Ancestors / Descendants: {expected['ancestors']} / {expected['descendants']}" in panel
+
+
+def test_highlight_request_marks_bins_of_aggregated_figure(client):
+    import data
+    store = data.get_store()
+    layout = client.get('/_dash-layout').get_json()
+    shown_key = _component(layout, 'figure-key')['data']
+    specialty = shown_key[1]
+    device = store.graph_index(specialty).select().node_ids[0]
+    values = {'specialty-dropdown.value': specialty, 'fda_filter.value': shown_key[2],
+              'year_slider.value': shown_key[3], 'highlight-request.data': shown_key,
+              'search-target.data': {'submission': device, 'sheets': [specialty]}}
+    # Without a shown figure-key the figure is sent whole rather than as a patch
+    response = _call(client, 'predicate-network-graph.figure', values, ['highlight-request.data'])
+    assert response['figure-key']['data'][4] == device
+    traces = response[GRAPH]['figure']['data']
+    bins = next(trace for trace in traces if trace['meta']['role'] == 'aggregate-nodes')
+    selected = bins['selectedpoints']
+    if isinstance(selected, dict):
+        selected = np.frombuffer(base64.b64decode(selected['bdata']), dtype=selected['dtype'])
+    assert len(selected) > 0
+    assert all('in the highlighted network' in bins['text'][i] for i in selected)
+
+
+def test_click_on_aggregated_bin_is_ignored(client):
+    layout = client.get('/_dash-layout').get_json()
+    shown_key = _component(layout, 'figure-key')['data']
+    figure = _component(layout, GRAPH)['figure']
+    bins = next(i for i, trace in enumerate(figure['data']) if trace['meta']['role'] == 'aggregate-nodes')
+    click = {'points': [{'curveNumber': bins, 'pointNumber': 0, 'pointIndex': 0, 'x': 1, 'y': 0,
+                         'text': figure['data'][bins]['text'][0]}]}
+    values = {'predicate-network-graph.clickData': click, 'info-offcanvas.is_open': False,
+              'specialty-dropdown.value': shown_key[1], 'fda_filter.value': shown_key[2],
+              'year_slider.value': shown_key[3]}
+    assert _call(client, 'info-offcanvas.is_open', values, ['predicate-network-graph.clickData']) == {}
@@ -0,0 +1,181 @@
+# Checks of the graph index on small hand-made sheets.
+#
+#   python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import graph_utils
+from graph_utils import DETAIL_COLUMNS, GraphIndex, Lineage, union_find_roots
+from search import SearchIndex
+
+
+# A sheet as data.clean_sheet leaves it, from (submission number, predicate, family, date) rows
+def _sheet(rows):
+    df = pd.DataFrame(rows, columns=['Submission_Number', 'Predicate', 'family', 'Date'])
+    df['Date'] = pd.to_datetime(df['Date'])
+    df['Device_Name'] = 'Device ' + df['Submission_Number'].fillna('without number')
+    for col in DETAIL_COLUMNS + ['Predicate_Location']:
+        if col not in df.columns:
+            df[col] = ''
+    return df
+
+
+# Both sheets list a row without a submission number; K3 and K4 are only on sheet B
+def _merged_with_blank_row():
+    return {
+        'A': _sheet([['K1', '', 1, '2001-01-01'], [np.nan, 'K1', 1, '2001-01-01'],
+                     ['K2', 'K1', 2, '2003-01-01']]),
+        'B': _sheet([['K3', '', 1, '2001-01-01'], ['K4', 'K3', 3, '2004-01-01'],
+                     [np.nan, '', 3, '2005-01-01']]),
+    }
+
+
+def test_projection_leaves_out_rows_without_submission_number():
+    merged = GraphIndex.merged(_merged_with_blank_row())
+    sheet = merged.project('A')
+    assert len(sheet) == 2
+    assert list(sheet.select().node_ids) == ['K1', 'K2']
+    assert list(merged.project('B').select().node_ids) == ['K3', 'K4']
+
+
+def test_jitter_ignores_rows_without_submission_number():
+    sheets = _merged_with_blank_row()
+    merged = GraphIndex.merged(sheets)
+    # K1 and K3 share family 1 and a date, one per sheet: spread in the merged view only
+    k1, k3 = merged.node_codes.get_indexer(['K1', 'K3'])
+    x = {code: merged.x[merged.row_node == code][0] for code in (k1, k3)}
+    assert x[k1] != x[k3] and abs(x[k1] - 1) == abs(x[k3] - 1)
+    assert merged.sheet_x[merged.row_node == k1][0] == 1
+    assert merged.sheet_x[merged.row_node == k3][0] == 1
+
+
+def test_search_skips_rows_without_submission_number():
+    index = SearchIndex(GraphIndex.merged(_merged_with_blank_row()))
+    hits = {hit['Submission_Number']: hit for hit in index.search('K', limit=10)}
+    assert hits['K3']['sheets'] == ['B'] and hits['K1']['sheets'] == ['A']
+    assert hits['K4']['sheets'] == ['B'] and hits['K4']['Device_Name'] == 'Device K4'
+
+
+# Reference lineage by walking every node's relatives one at a time
+def _reference_lineage(n_nodes, edges):
+    children = [[] for _ in range(n_nodes)]
+    parents = [[] for _ in range(n_nodes)]
+    for s, d in edges:
+        children[s].append(d)
+        parents[d].append(s)
+
+    def reach(start, links):
+        seen, stack = set(), [start]
+        while stack:
+            for other in links[stack.pop()]:
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        return seen
+
+    depth = [None] * n_nodes
+
+    def longest(node):
+        if depth[node] is None:
+            depth[node] = max((longest(p) + 1 for p in parents[node]), default=0)
+        return depth[node]
+
+    root_distance = []
+    for node in range(n_nodes):
+        distance, frontier = 0, {node}
+        while not any(not parents[f] for f in frontier):
+            frontier = {p for f in frontier for p in parents[f]}
+            distance += 1
+        root_distance.append(distance)
+    return {
+        'depth': [longest(node) for node in range(n_nodes)],
+        'root_distance': root_distance,
+        'ancestors': [len(reach(node, parents)) for node in range(n_nodes)],
+        'descendants': [len(reach(node, children)) for node in range(n_nodes)],
+    }
+
+
+# A random DAG over shuffled node numbers, with some nodes of several predicates
+def _random_dag(rng, n_nodes, n_edges):
+    order = rng.permutation(n_nodes)
+    a, b = rng.integers(0, n_nodes, (2, n_edges))
+    keep = a < b
+    edges = sorted({(order[s], order[d]) for s, d in zip(a[keep], b[keep])})
+    return [(int(s), int(d)) for s, d in edges]
+
+
+def _lineage(n_nodes, edges, creep=()):
+    src = np.array([s for s, _ in edges], dtype=np.int64)
+    dst = np.array([d for _, d in edges], dtype=np.int64)
+    flags = np.zeros(n_nodes, dtype=bool)
+    flags[list(creep)] = True
+    return Lineage(n_nodes, src, dst, np.zeros(n_nodes, dtype=bool), flags)
+
+
+def test_lineage_matches_reference_on_random_dags(monkeypatch):
+    # Small blocks so components over 64 nodes take several passes of _reach_counts
+    monkeypatch.setattr(graph_utils, 'REACH_BLOCK_BYTES', 64)
+    rng = np.random.default_rng(7)
+    for n_nodes, n_edges in [(12, 10), (40, 60), (150, 170), (200, 500)]:
+        edges = _random_dag(rng, n_nodes, n_edges)
+        lineage = _lineage(n_nodes, edges)
+        for col, values in _reference_lineage(n_nodes, edges).items():
+            assert getattr(lineage, col).tolist() == values, (n_nodes, col)
+
+
+def test_union_find_matches_reference_components():
+    rng = np.random.default_rng(3)
+    n_nodes = 300
+    src, dst = rng.integers(0, n_nodes, (2, 200))
+    roots = union_find_roots(n_nodes, src, dst)
+    components = {node: {node} for node in range(n_nodes)}
+    for s, d in zip(src, dst):
+        merged = components[s] | components[d]
+        for node in merged:
+            components[node] = merged
+    for node in range(n_nodes):
+        assert roots[node] == min(components[node])
+
+
+def test_lineage_breaks_cycles_at_edges_to_earlier_nodes():
+    # 0 -> 1 -> 2 -> 0 loses 2 -> 0; 3 hangs off the cycle
+    lineage = _lineage(4, [(0, 1), (1, 2), (2, 0), (2, 3)], creep=[0])
+    assert lineage.depth.tolist() == [0, 1, 2, 3]
+    assert lineage.ancestors.tolist() == [0, 1, 2, 3]
+    assert lineage.descendants.tolist() == [3, 2, 1, 0]
+    assert lineage.creep_distance.tolist() == [0, 1, 2, 3]
+
+
+def test_lineage_counts_in_components_over_the_exact_limit(monkeypatch):
+    # A diamond 0 -> {1, 2} -> 3 -> 4, and a chain 5 -> 6 -> 7 that needs no exact count
+    edges = [(0, 1), (0, 2), (1, 3), (2, 3), (3, 4), (5, 6), (6, 7)]
+    assert _lineage(8, edges).ancestors.tolist() == [0, 1, 1, 3, 4, 0, 1, 2]
+
+    monkeypatch.setattr(graph_utils, 'REACH_EXACT_NODES', 2)
+    lineage = _lineage(8, edges)
+    assert lineage.ancestors.tolist() == [0, 1, 1, -1, -1, 0, 1, 2]
+    assert lineage.descendants.tolist() == [-1, -1, -1, 1, 0, 2, 1, 0]
+
+    # Whatever is still counted above the limit is exact
+    rng = np.random.default_rng(11)
+    edges = _random_dag(rng, 120, 150)
+    lineage = _lineage(120, edges)
+    reference = _reference_lineage(120, edges)
+    for col in ('ancestors', 'descendants'):
+        counted = getattr(lineage, col) >= 0
+        assert 0 < counted.sum() < 120
+        assert (getattr(lineage, col)[counted] == np.array(reference[col])[counted]).all()
+
+
+def test_popcount_without_numpy_bitwise_count(monkeypatch):
+    bits = np.random.default_rng(5).integers(0, 2**63, (20, 3), dtype=np.uint64)
+    expected = [sum(bin(int(v)).count('1') for v in row) for row in bits]
+    assert graph_utils._row_popcounts(bits).tolist() == expected
+    monkeypatch.delattr(np, 'bitwise_count', raising=False)
+    assert graph_utils._row_popcounts(bits).tolist() == expected